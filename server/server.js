@@ -10,6 +10,7 @@ const samples = require('../src/pages/api/samples');
 const supplements = require('../src/pages/api/supplements');
 const locations = require('../src/pages/api/locations');
 const stat = require('../src/pages/api/stat');
+const statQuery = require('../src/pages/api/stat-query');
 
 const app = express();
 
@@ -29,6 +30,7 @@ app.use('/api/samples', samples);
 app.use('/api/supplements', supplements);
 app.use('/api/locations', locations);
 app.use('/api/stat', stat);
+app.use('/api/stat-query', statQuery);
 
 // serve SPA contents
 app.use(history({index: '/index.html'}));
@@ -0,0 +1,24 @@
+const fetch = require('cross-fetch');
+
+// slices of stat views answered by tools/StatViewTableProcess/Stat_Query_Service.py
+const queryUrl = process.env.STAT_QUERY_URL;
+
+module.exports = async (req, res) => {
+  if (req.method === 'GET' && queryUrl) {
+    const dataSet = req.session ? req.session.datasetSuffix : process.env.DEFAULT_DATA_SET;
+    const params = new URLSearchParams(req.url.split('?')[1] || '');
+    if (dataSet) {
+      params.set('dataset', dataSet);
+    }
+    try {
+      const response = await fetch(`${queryUrl}/query?${params}`);
+      res.setHeader('Content-Type', 'application/json; charset=utf-8');
+      res.status(response.status).send(await response.text());
+    } catch (e) {
+      console.warn(e);
+      res.status(502).json({error: 'stat query service is not available'});
+    }
+  } else {
+    res.status(404).send('Not Found');
+  }
+};
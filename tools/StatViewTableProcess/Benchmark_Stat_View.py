@@ -0,0 +1,187 @@
+import sys
+import os
+import argparse
+import json
+import time
+import datetime
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import pandas as pd
+import numpy as np
+
+import Stat_View_Table_Process as stat
+import Generate_Synthetic_Data as synthetic
+
+# -*- coding: utf-8 -*-
+"""This tool measures performance of Stat_View_Table_Process.py on synthetic data
+   For each scale, input files are generated by Generate_Synthetic_Data.py, then the pre-processing steps,
+   processTargetCountByPeriod and every stat view are timed. Results are written as JSON to compare runs across commits.
+
+   Format：python Benchmark_Stat_View.py [options]
+   ex： python Benchmark_Stat_View.py --samples 10000,1000000 --output bench-result.json
+
+   Options:
+     --samples N[,N...]         number of samples of each scale (default: 10000)
+     --mutations-per-sample N   average number of mutations of each sample (default: 30)
+     --mutations N              number of distinct mutations (default: 20000)
+     --countries N              number of countries (default: 150)
+     --cities N                 number of cities in each country (default: 20)
+     --start-date DATE          first collection date (default: 2020-01-01)
+     --days N                   span of collection dates in days (default: 600)
+     --zipf S                   exponent of Zipf distribution of mutation and country frequencies (default: 1.1)
+     --seed N                   random seed (default: 0)
+     --work-dir DIR             folder for generated data and output (default: temporary folder, removed at exit)
+     --output FILE              JSON file of results (default: print to stdout)
+
+   Each step records wall time, CPU time and peak RSS (kB) of the process.
+   Each stat view runs in a forked child process, so its peak RSS is measured apart from the other views.
+
+"""
+
+#----------------------------------------------------------------------------------------------------------
+# get peak RSS in kB (ru_maxrss is in bytes on macOS)
+def getPeakRss(usage):
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+#----------------------------------------------------------------------------------------------------------
+# run function and record its wall time, CPU time and peak RSS of this process
+def measureStep(steps, name, function, *args):
+    startUsage = resource.getrusage(resource.RUSAGE_SELF)
+    startTime = time.time()
+    result = function(*args)
+    wallTime = time.time() - startTime
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    steps.append({
+        'name': name,
+        'wallTime': wallTime,
+        'cpuTime': (usage.ru_utime + usage.ru_stime) - (startUsage.ru_utime + startUsage.ru_stime),
+        'peakRss': getPeakRss(usage),
+    })
+    print("{:<48} {:>10.3f} s".format(name, wallTime))
+
+    return result
+
+#----------------------------------------------------------------------------------------------------------
+# run one stat view in a forked child process and record its resource usage
+def measureStatView(viewIndex):
+    view = stat.statViewContext[0][viewIndex]
+    startTime = time.time()
+    pid = os.fork()
+    if pid == 0:
+        # child: write output of view and exit without running any cleanup of parent
+        viewTrace = stat.runStatView(viewIndex)
+        sys.stdout.flush()
+        os._exit(0 if viewTrace['succeeded'] else 1)
+    _, status, usage = os.wait4(pid, 0)
+    wallTime = time.time() - startTime
+
+    print("{:<48} {:>10.3f} s".format('No.' + str(view.number) + ' ' + view.fileName, wallTime))
+    return {
+        'number': view.number,
+        'fileName': view.fileName,
+        'succeeded': status == 0,
+        'wallTime': wallTime,
+        'cpuTime': usage.ru_utime + usage.ru_stime,
+        'peakRss': getPeakRss(usage),
+    }
+
+#----------------------------------------------------------------------------------------------------------
+
+# dataOptions = keyword arguments of Generate_Synthetic_Data.generateData other than samples, recorded in result
+def runBenchmark(workFolder, samples, dataOptions):
+    version = 'bench'
+    dataset = 'Synthetic' + str(samples)
+    inputFolder = os.path.join(workFolder, 'data', version, dataset)
+    outputFolder = os.path.join(workFolder, 'data', version, 'Stat-' + dataset)
+    os.makedirs(outputFolder, exist_ok=True)
+    result = dict({'samples': samples}, **dataOptions)
+    result.update({'steps': [], 'views': []})
+    steps = result['steps']
+
+    print("---------- Scale: " + str(samples) + " samples ----------")
+    result['data'] = measureStep(steps, 'generate', lambda: synthetic.generateData(workFolder, version, dataset, samples, **dataOptions))
+    sampleFilePath = os.path.join(inputFolder, 'samples_' + version + '_' + dataset + '.tsv')
+    variantFilePath = os.path.join(inputFolder, 'variant_' + version + '_' + dataset + '.tsv')
+    cladeFilePath = os.path.join(inputFolder, 'clade_' + version + '_' + dataset + '.tsv')
+
+    # same steps as __main__ of Stat_View_Table_Process.py without cache
+    sampleData = measureStep(steps, 'load samples', stat.loadTable, sampleFilePath, stat.sampleSchema)
+    sampleData = measureStep(steps, 'dateProcess', stat.dateProcess, sampleData)
+    variantData = measureStep(steps, 'load variant', stat.loadTable, variantFilePath, stat.variantSchema)
+    cladeData = measureStep(steps, 'load clade', stat.loadTable, cladeFilePath, stat.cladeSchema)
+    sampleCube = measureStep(steps, 'sample cube', stat.buildAggregationCube, sampleData)
+    sampleLookup = measureStep(steps, 'sample lookup', stat.buildSampleLookup, sampleData)
+    variantCube = measureStep(steps, 'variant cube', stat.buildIndexedAggregationCube, variantData, sampleLookup, 'Mutation', ['Gene', 'Protein'])
+    cladeCube = measureStep(steps, 'clade cube', stat.buildIndexedAggregationCube, cladeData, sampleLookup, 'Detail')
+    catalog = measureStep(steps, 'mutation catalog', stat.buildMutationCatalog, variantCube)
+
+    # processTargetCountByPeriod on merged data, without aggregation cube
+    merge = lambda data: stat.fillUnknownColumns(pd.merge(data, sampleData, how='left', on ='Sample'))
+    mergedVariantData = measureStep(steps, 'merge variant', merge, variantData)
+    mergedCladeData = measureStep(steps, 'merge clade', merge, cladeData)
+    for selectRange in ['Geo_Region', 'Geo_Country', 'Geo_City']:
+        measureStep(steps, 'processTargetCountByPeriod ' + selectRange, stat.processTargetCountByPeriod,
+                    mergedVariantData, selectRange, 'Mutation', 'Week')
+    del cladeData, mergedVariantData, mergedCladeData
+
+    inputs = {'sample': sampleCube, 'variant': variantCube, 'clade': cladeCube, 'sampleData': sampleData, 'variantData': variantData,
+              'catalog': catalog, 'latestCollectionDate': stat.getLatestCollectionDate(sampleData)}
+    stat.statViewContext = (stat.statViews, inputs, outputFolder, version, dataset, {})
+    for viewIndex in range(len(stat.statViews)):
+        result['views'].append(measureStatView(viewIndex))
+
+    return result
+
+#----------------------------------------------------------------------------------------------------------
+# get commit of working tree, to compare results across commits
+def getCommit():
+    try:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=folder, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#----------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Measure performance of Stat_View_Table_Process.py on synthetic data')
+    parser.add_argument('--samples', default='10000', help='comma separated number of samples of each scale')
+    parser.add_argument('--mutations-per-sample', type=int, default=30, help='average number of mutations of each sample')
+    parser.add_argument('--mutations', type=int, default=20000, help='number of distinct mutations')
+    parser.add_argument('--countries', type=int, default=150, help='number of countries')
+    parser.add_argument('--cities', type=int, default=20, help='number of cities in each country')
+    parser.add_argument('--start-date', default='2020-01-01', help='first collection date')
+    parser.add_argument('--days', type=int, default=600, help='span of collection dates in days')
+    parser.add_argument('--zipf', type=float, default=1.1, help='exponent of Zipf distribution')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--work-dir', help='folder for generated data and output')
+    parser.add_argument('--output', help='JSON file of results')
+    args = parser.parse_args()
+
+    dataOptions = {'mutationsPerSample': args.mutations_per_sample, 'mutations': args.mutations, 'countries': args.countries, 'cities': args.cities,
+                   'startDate': args.start_date, 'days': args.days, 'zipfExponent': args.zipf, 'seed': args.seed}
+    workFolder = args.work_dir or tempfile.mkdtemp(prefix='stat-view-benchmark-')
+    try:
+        report = {
+            'commit': getCommit(),
+            'date': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'cpuCount': os.cpu_count(),
+            'scales': [runBenchmark(workFolder, int(samples), dataOptions) for samples in args.samples.split(',')],
+        }
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(workFolder, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,182 @@
+import sys
+import os
+import argparse
+import pandas as pd
+import numpy as np
+
+# -*- coding: utf-8 -*-
+"""This tool creates synthetic input files of Stat_View_Table_Process.py at any scale
+   samples_{version}_{dataset}.tsv, variant_{version}_{dataset}.tsv and clade_{version}_{dataset}.tsv
+   are written into {root}/data/{version}/{dataset}, with the same columns as released files.
+
+   Format：python Generate_Synthetic_Data.py {root} [options]
+   ex： python Generate_Synthetic_Data.py ./bench --samples 1000000
+
+   Options:
+     --version V, --dataset D   version and data set of generated files (default: bench, Synthetic)
+     --samples N                number of samples (default: 10000)
+     --mutations-per-sample N   average number of mutations of each sample (default: 30)
+     --mutations N              number of distinct mutations (default: 20000)
+     --countries N              number of countries (default: 150)
+     --cities N                 number of cities in each country (default: 20)
+     --start-date DATE          first collection date (default: 2020-01-01)
+     --days N                   span of collection dates in days (default: 600)
+     --zipf S                   exponent of Zipf distribution of mutation and country frequencies (default: 1.1)
+     --seed N                   random seed (default: 0)
+
+"""
+
+#----------------------------------------------------------------------------------------------------------
+
+regions = ['Africa', 'Asia', 'Europe', 'North America', 'Oceania', 'South America']
+
+clades = ['19A', '19B', '20A', '20B', '20C', '20D', '20E (EU1)', '20F', '20G', '20H (Beta, V2)',
+          '20I (Alpha, V1)', '20J (Gamma, V3)', '21A (Delta)', '21B (Kappa)', '21C (Epsilon)', '21D (Eta)']
+
+# (start position, gene, proteins) of SARS-CoV-2 genome, proteins of ORF1ab split its range evenly
+genomeLength = 29903
+genes = [
+    (266, 'ORF1ab', ['nsp' + str(number) for number in range(1, 17)]),
+    (21563, 'S', []),
+    (25393, 'ORF3a', []),
+    (26245, 'E', []),
+    (26523, 'M', []),
+    (27202, 'ORF6', []),
+    (27394, 'ORF7a', []),
+    (27894, 'ORF8', []),
+    (28274, 'N', []),
+    (29558, 'ORF10', []),
+]
+
+#----------------------------------------------------------------------------------------------------------
+# probabilities of ranks 1..n following Zipf distribution
+def zipfProbabilities(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+
+    return weights / weights.sum()
+
+#----------------------------------------------------------------------------------------------------------
+# create catalog of distinct mutations with gene and protein of each position
+def createMutationCatalog(rng, mutations):
+    positions = np.sort(rng.choice(np.arange(1, genomeLength + 1), size=min(mutations, genomeLength), replace=False))
+    bases = np.array(list('ACGT'))
+    references = rng.randint(0, 4, size=len(positions))
+    alternatives = (references + rng.randint(1, 4, size=len(positions))) % 4
+    names = pd.Series(positions.astype(str)) + pd.Series(bases[references]) + '>' + pd.Series(bases[alternatives])
+
+    geneStarts = np.array([start for start, gene, proteins in genes])
+    geneNumbers = np.searchsorted(geneStarts, positions, side='right') - 1
+    geneNames = np.array([gene for start, gene, proteins in genes] + [''])
+    # positions before first gene are non coding
+    geneNumbers[geneNumbers < 0] = len(genes)
+
+    proteinNames = np.full(len(positions), '', dtype=object)
+    for number, (start, gene, proteins) in enumerate(genes):
+        if len(proteins) == 0:
+            continue
+        end = genes[number + 1][0]
+        inGene = geneNumbers == number
+        proteinNumbers = (positions[inGene] - start) * len(proteins) // (end - start)
+        proteinNames[inGene] = np.array(proteins)[proteinNumbers]
+
+    return pd.DataFrame({'Mutation': names.values, 'Gene': geneNames[geneNumbers], 'Protein': proteinNames})
+
+#----------------------------------------------------------------------------------------------------------
+# create countries with their continent and cities
+def createLocations(rng, countries, cities):
+    countryNames = np.array(['Country ' + str(number) for number in range(countries)])
+    countryRegions = np.array(regions)[rng.randint(0, len(regions), size=countries)]
+    cityNames = np.array([[countryName + ' City ' + str(number) for number in range(cities)] for countryName in countryNames])
+
+    return countryNames, countryRegions, cityNames
+
+#----------------------------------------------------------------------------------------------------------
+
+def generateData(rootFolder, version='bench', dataset='Synthetic', samples=10000, mutationsPerSample=30, mutations=20000,
+                 countries=150, cities=20, startDate='2020-01-01', days=600, zipfExponent=1.1, seed=0, chunkSize=100000):
+    rng = np.random.RandomState(seed)
+    outputFolder = os.path.join(rootFolder, 'data', version, dataset)
+    os.makedirs(outputFolder, exist_ok=True)
+    sampleFilePath = os.path.join(outputFolder, 'samples_' + version + '_' + dataset + '.tsv')
+    variantFilePath = os.path.join(outputFolder, 'variant_' + version + '_' + dataset + '.tsv')
+    cladeFilePath = os.path.join(outputFolder, 'clade_' + version + '_' + dataset + '.tsv')
+
+    catalog = createMutationCatalog(rng, mutations)
+    mutationProbabilities = zipfProbabilities(len(catalog), zipfExponent)
+    countryNames, countryRegions, cityNames = createLocations(rng, countries, cities)
+    countryProbabilities = zipfProbabilities(countries, zipfExponent)
+    start = np.datetime64(startDate, 'D')
+
+    variantRows = 0
+    for first in range(0, samples, chunkSize):
+        count = min(chunkSize, samples - first)
+        sampleNames = pd.Series(np.arange(first, first + count)).map('EPI_ISL_{:d}'.format).values
+
+        # sequencing grows over time, so later dates are more frequent
+        dayFractions = rng.power(2, size=count)
+        dates = (start + (dayFractions * days).astype(int)).astype(str)
+        countryNumbers = rng.choice(countries, size=count, p=countryProbabilities)
+        cityNumbers = rng.randint(0, cities, size=count)
+        sampleCities = cityNames[countryNumbers, cityNumbers].astype(object)
+        # many samples are uploaded without city
+        sampleCities[rng.rand(count) < 0.3] = ''
+        sampleData = pd.DataFrame({
+            'sample': sampleNames,
+            'Collection_Date': dates,
+            'Publications': '',
+            'Geo_Country': countryNames[countryNumbers],
+            'Geo_Region': countryRegions[countryNumbers],
+            'Geo_City': sampleCities,
+            'Isolate': sampleNames,
+        })
+
+        # mutations of each sample, duplicated draws of same sample are dropped
+        mutationCounts = rng.poisson(mutationsPerSample, size=count)
+        variantSamples = np.repeat(sampleNames, mutationCounts)
+        variantMutations = rng.choice(len(catalog), size=mutationCounts.sum(), p=mutationProbabilities)
+        variantData = pd.DataFrame({'Sample': variantSamples, 'MutationNumber': variantMutations}).drop_duplicates()
+        variantData = variantData.join(catalog, on='MutationNumber')
+        variantData = pd.DataFrame({
+            'Sample': variantData['Sample'],
+            'Mutation': variantData['Mutation'],
+            'Gene': variantData['Gene'],
+            'AA_change': '',
+            'Type': 'SNP',
+            'Protein': variantData['Protein'],
+            'Protein_AA_change': '',
+        })
+        variantRows += len(variantData)
+
+        # later samples belong to later clades
+        cladeNumbers = np.clip((dayFractions * len(clades) + rng.normal(0, 1.5, size=count)).astype(int), 0, len(clades) - 1)
+        cladeData = pd.DataFrame({'Sample': sampleNames, 'Type': 'clade', 'Detail': np.array(clades)[cladeNumbers]})
+
+        mode = 'w' if first == 0 else 'a'
+        sampleData.to_csv(sampleFilePath, sep='\t', index=False, header=first == 0, mode=mode)
+        variantData.to_csv(variantFilePath, sep='\t', index=False, header=first == 0, mode=mode)
+        cladeData.to_csv(cladeFilePath, sep='\t', index=False, header=first == 0, mode=mode)
+
+    return {'samples': samples, 'variantRows': variantRows, 'cladeRows': samples}
+
+#----------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Create synthetic input files of Stat_View_Table_Process.py')
+    parser.add_argument('root', help='folder where data/{version}/{dataset} is created')
+    parser.add_argument('--version', default='bench', help='version of generated files')
+    parser.add_argument('--dataset', default='Synthetic', help='data set of generated files')
+    parser.add_argument('--samples', type=int, default=10000, help='number of samples')
+    parser.add_argument('--mutations-per-sample', type=int, default=30, help='average number of mutations of each sample')
+    parser.add_argument('--mutations', type=int, default=20000, help='number of distinct mutations')
+    parser.add_argument('--countries', type=int, default=150, help='number of countries')
+    parser.add_argument('--cities', type=int, default=20, help='number of cities in each country')
+    parser.add_argument('--start-date', default='2020-01-01', help='first collection date')
+    parser.add_argument('--days', type=int, default=600, help='span of collection dates in days')
+    parser.add_argument('--zipf', type=float, default=1.1, help='exponent of Zipf distribution')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    size = generateData(args.root, args.version, args.dataset, args.samples, args.mutations_per_sample, args.mutations,
+                        args.countries, args.cities, args.start_date, args.days, args.zipf, args.seed)
+    print("Generated " + str(size['samples']) + " samples, " + str(size['variantRows']) + " variant rows")
@@ -0,0 +1,303 @@
+import sys
+import os
+import argparse
+import json
+import time
+import collections
+import threading
+import socketserver
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+import Stat_View_Table_Process as stat
+
+# -*- coding: utf-8 -*-
+"""This tool answers slice queries of time series counts over local HTTP, without reading whole stat view files
+   Daily indexes saved by Stat_View_Table_Process.py with --daily-index are memory-mapped once at start,
+   then counts of any regions, items, period and date range are summed from their cumulative daily counts.
+
+   Format：python Stat_Query_Service.py {version} {dataset}[,{dataset}...] [options]
+   ex： python Stat_Query_Service.py r18 Full,NCBI --port 8050 --cache-mb 512
+
+   Options:
+     --host HOST         address to listen on (default: 127.0.0.1)
+     --port N            port to listen on (default: 8050)
+     --cache-mb MB       size of query results kept in LRU cache (default: 256, 0 to disable)
+
+   Endpoints:
+     GET /query?dataset=Full&input=variant&level=country&region=Japan&item=23403A>G&period=week&from=2021-01-01&to=2021-06-30
+       dataset = data set of the query (default: first data set)
+       input = 'sample', 'variant' or 'clade' (default: variant)
+       level = 'continent', 'country' or 'city' (default: country)
+       region, item = repeated for several regions or items, all of them when not given (item is Mutation, or Detail of clade)
+       period = 'month', 'week' or 'day' (default: week)
+       from, to = first and last collection date (default: whole range), periods partly in range count days in range only
+       returns {"columns": [region column, [item column]], "periods": [labels], "rows": [[region, [item,] count of each period]]}
+       rows are in order of stat view tables, rows without counts in the range are dropped
+     GET /indexes        daily indexes loaded, with number of series and date range of each
+     GET /metrics        number of queries, cache hits, misses and size, latency (ms) of recent queries
+   Latency of each query is also given in Server-Timing header of its response.
+   server/server.js proxies /api/stat-query to this service when STAT_QUERY_URL is set.
+
+"""
+
+#----------------------------------------------------------------------------------------------------------
+
+# query parameter values and names used in stat views
+queryLevels = {'continent': 'Geo_Region', 'country': 'Geo_Country', 'city': 'Geo_City'}
+queryPeriods = {'month': 'YearMonth', 'week': 'Week', 'day': 'YearMonthDay'}
+queryInputs = ['sample', 'variant', 'clade']
+
+# number of recent queries used for latency percentiles
+latencyWindow = 1000
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+#----------------------------------------------------------------------------------------------------------
+
+# daily indexes of data sets, {(dataset, input, selectRange): (dailyIndex, lookups)}
+#   lookups = {series column: {value: rows of dailyIndex.series}}, to select series without scanning them
+def loadDailyIndexes(version, datasets):
+    indexes = collections.OrderedDict()
+    for dataset in datasets:
+        indexFolder = os.path.join('data', version, 'Stat-' + dataset, stat.dailyIndexFolderName)
+        if not os.path.isdir(indexFolder):
+            print('Warning: ' + indexFolder + ' does not exist, run Stat_View_Table_Process.py ' + version + ' ' + dataset + ' --daily-index')
+            continue
+        for indexName in sorted(os.listdir(indexFolder)):
+            # folder name is {input}_{selectRange} (see buildDailyIndexes)
+            input, selectRange = indexName.split('_', 1)
+            dailyIndex = stat.loadDailyIndex(os.path.join(indexFolder, indexName))
+            lookups = {column: dailyIndex.series.groupby(column, sort=False).indices for column in dailyIndex.series.columns}
+            indexes[(dataset, input, selectRange)] = (dailyIndex, lookups)
+            print('Loaded ' + dataset + ' ' + indexName + ': ' + str(len(dailyIndex.series)) + ' series')
+
+    return indexes
+
+#----------------------------------------------------------------------------------------------------------
+
+# parse query string into normalized key of query, which is also the key of its cached result
+#   key = (dataset, input, selectRange, regions, items, period, firstDay, lastDay), None for values not given
+def parseQuery(query, datasets):
+    parameters = parse_qs(query, keep_blank_values=True)
+    getValue = lambda name, default: parameters[name][-1] if name in parameters else default
+
+    dataset = getValue('dataset', datasets[0])
+    input = getValue('input', 'variant')
+    level = getValue('level', 'country')
+    period = getValue('period', 'week')
+    if dataset not in datasets:
+        raise QueryError(404, 'Unknown dataset: ' + dataset)
+    if input not in queryInputs:
+        raise QueryError(400, 'input must be one of ' + ', '.join(queryInputs))
+    if level not in queryLevels:
+        raise QueryError(400, 'level must be one of ' + ', '.join(queryLevels))
+    if period not in queryPeriods:
+        raise QueryError(400, 'period must be one of ' + ', '.join(queryPeriods))
+    try:
+        firstDay = stat.getDayCode(parameters['from'][-1]) if 'from' in parameters else None
+        lastDay = stat.getDayCode(parameters['to'][-1]) if 'to' in parameters else None
+    except ValueError:
+        raise QueryError(400, 'from and to must be dates (YYYY-MM-DD)')
+    regions = tuple(sorted(set(parameters['region']))) if 'region' in parameters else None
+    items = tuple(sorted(set(parameters['item']))) if 'item' in parameters else None
+
+    return (dataset, input, queryLevels[level], regions, items, queryPeriods[period], firstDay, lastDay)
+
+# result of query, which is encoded into JSON by sendQuery
+def processQuery(indexes, key):
+    dataset, input, selectRange, regions, items, period, firstDay, lastDay = key
+    if (dataset, input, selectRange) not in indexes:
+        raise QueryError(404, 'No daily index of ' + input + '_' + selectRange + ' in ' + dataset + ', run Stat_View_Table_Process.py with --daily-index')
+    dailyIndex, lookups = indexes[(dataset, input, selectRange)]
+
+    seriesNumbers = None
+    itemColumn = dailyIndex.series.columns[1] if dailyIndex.series.shape[1] > 1 else None
+    for column, values in [(selectRange, regions), (itemColumn, items)]:
+        if values is not None:
+            rows = [lookups[column][value] for value in values if column in lookups and value in lookups[column]]
+            rows = np.sort(np.concatenate(rows)) if rows else np.array([], dtype=np.int64)
+            seriesNumbers = rows if seriesNumbers is None else np.intersect1d(seriesNumbers, rows, assume_unique=True)
+    if seriesNumbers is None:
+        seriesNumbers = np.arange(len(dailyIndex.series), dtype=np.int64)
+
+    # date range is clipped to days of the index
+    indexLastDay = dailyIndex.firstDay + dailyIndex.span - 2
+    firstDay = dailyIndex.firstDay if firstDay is None else max(firstDay, dailyIndex.firstDay)
+    lastDay = indexLastDay if lastDay is None else min(lastDay, indexLastDay)
+    if firstDay > lastDay or len(seriesNumbers) == 0:
+        return {'columns': list(dailyIndex.series.columns), 'periods': [], 'rows': []}
+
+    start, end = stat.getDayPeriodCodes([firstDay, lastDay], period)
+    dateColumns = stat.createDateColumns(start, end, period)
+    bounds = stat.getPeriodFirstDays(np.append(dateColumns, dateColumns[-1] + 1), period)
+    bounds[0], bounds[-1] = firstDay, lastDay + 1
+    counts = stat.countDailyIndexRanges(dailyIndex, bounds, seriesNumbers)
+
+    found = counts.sum(axis=1) > 0
+    series = dailyIndex.series.values[seriesNumbers[found]].tolist()
+    rows = [names + periodCounts for names, periodCounts in zip(series, counts[found].tolist())]
+
+    return {'columns': list(dailyIndex.series.columns), 'periods': list(stat.formatPeriodLabels(dateColumns, period)), 'rows': rows}
+
+#----------------------------------------------------------------------------------------------------------
+
+# least recently used results of queries, evicted by total size of their encoded JSON
+class QueryCache:
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            content = self.entries.get(key)
+            if content is not None:
+                self.entries.move_to_end(key)
+            return content
+
+    def put(self, key, content):
+        # result larger than whole cache would evict every other result, so it is not kept
+        if len(content) > self.maxBytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = content
+            self.bytes += len(content)
+            while self.bytes > self.maxBytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+# query counts and latency (seconds) of recent queries
+class QueryMetrics:
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=latencyWindow)
+        self.lock = threading.Lock()
+
+    def record(self, outcome, latency):
+        with self.lock:
+            self.counts[outcome] += 1
+            self.latencies.append(latency)
+
+    def report(self, cache):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            report = {
+                'queries': sum(self.counts.values()),
+                'cacheHits': self.counts['hit'],
+                'cacheMisses': self.counts['miss'],
+                'errors': self.counts['error'],
+                'cacheEntries': len(cache.entries),
+                'cacheBytes': cache.bytes,
+                'cacheMaxBytes': cache.maxBytes,
+            }
+        if len(latencies):
+            report['latencyMs'] = {
+                'queries': len(latencies),
+                'mean': float(latencies.mean()),
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max()),
+            }
+
+        return report
+
+#----------------------------------------------------------------------------------------------------------
+
+class StatQueryServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, indexes, datasets, cache):
+        HTTPServer.__init__(self, address, StatQueryHandler)
+        self.indexes = indexes
+        self.datasets = datasets
+        self.cache = cache
+        self.metrics = QueryMetrics()
+
+class StatQueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/query':
+            self.sendQuery(url.query)
+        elif url.path == '/indexes':
+            self.sendJson(200, json.dumps(getIndexList(self.server.indexes)).encode('utf-8'))
+        elif url.path == '/metrics':
+            self.sendJson(200, json.dumps(self.server.metrics.report(self.server.cache)).encode('utf-8'))
+        else:
+            self.sendJson(404, json.dumps({'error': 'Not Found'}).encode('utf-8'))
+
+    def sendQuery(self, query):
+        startTime = time.time()
+        try:
+            key = parseQuery(query, self.server.datasets)
+            content = self.server.cache.get(key)
+            outcome = 'hit'
+            if content is None:
+                result = processQuery(self.server.indexes, key)
+                content = json.dumps(result, separators=(',', ':'), ensure_ascii=False, default=stat.getJsonValue).encode('utf-8')
+                self.server.cache.put(key, content)
+                outcome = 'miss'
+            status = 200
+        except QueryError as e:
+            status, outcome = e.status, 'error'
+            content = json.dumps({'error': str(e)}).encode('utf-8')
+        latency = time.time() - startTime
+        self.server.metrics.record(outcome, latency)
+        self.sendJson(status, content, {'Server-Timing': 'query;desc="' + outcome + '";dur=' + '{:.3f}'.format(latency * 1000)})
+
+    def sendJson(self, status, content, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+def getIndexList(indexes):
+    indexList = []
+    for (dataset, input, selectRange), (dailyIndex, lookups) in indexes.items():
+        indexList.append({
+            'dataset': dataset,
+            'input': input,
+            'selectRange': selectRange,
+            'series': len(dailyIndex.series),
+            'firstDate': str(np.datetime64(dailyIndex.firstDay, 'D')),
+            'lastDate': str(np.datetime64(dailyIndex.firstDay + dailyIndex.span - 2, 'D')),
+        })
+
+    return indexList
+
+#----------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Answer slice queries of stat views over local HTTP')
+    parser.add_argument('version', help='version of data')
+    parser.add_argument('dataset', help='comma separated data sets')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8050, help='port to listen on')
+    parser.add_argument('--cache-mb', type=float, default=256, help='size of query results kept in LRU cache (MB)')
+    args = parser.parse_args()
+
+    datasets = args.dataset.split(',')
+    stat.buildPeriodLabelCache()
+    indexes = loadDailyIndexes(args.version, datasets)
+    if len(indexes) == 0:
+        sys.exit('Error: no daily index is found')
+
+    server = StatQueryServer((args.host, args.port), indexes, datasets, QueryCache(int(args.cache_mb * 1024 * 1024)))
+    print('Stat query service listening on http://' + args.host + ':' + str(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
@@ -6,13 +6,72 @@ import numpy as np
 import json
 import traceback
 import datetime
+import argparse
+import collections
+import multiprocessing
+import multiprocessing.connection
+import hashlib
+import fnmatch
+import re
+import time
+import cProfile
+import shutil
+import zlib
+import itertools
+import multiprocessing.pool
+try:
+    import zstandard
+except ImportError:
+    # only needed for --compress zstd
+    zstandard = None
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak memory is not recorded there
+    resource = None
 
 # -*- coding: utf-8 -*-
 """This tool creates tables for displaying COVID-19 stat views 
    By providing the Input folder as below, the following types of output file will be created.
 
-   Format：python Stat_View_Table_Process.py {version} {dataset}
+   Format：python Stat_View_Table_Process.py {version} {dataset}[,{dataset}...] [options]
    ex： python Stat_View_Table_Process.py r18 Full
+       python Stat_View_Table_Process.py r18 Full,NCBI --memory-budget 16000
+
+   Options:
+     --stream            read variant and clade files in chunks, for files larger than memory
+     --chunk-size N      number of rows per chunk in stream mode (default: 1000000)
+     --save-state        save aggregated counts and sample manifest for incremental runs of next version
+     --incremental-from V  update saved state of previous version V with added/removed samples,
+                           add --save-state to keep the updated state for next version,
+                           rows of removed samples are read from variant/clade files of V (or their cache) in data/V/{dataset},
+                           all samples are aggregated again when they are missing
+     --shards N          partitioned mode, split input files into N shards by --partition-by, aggregate each of them on --workers processes,
+                         then merge their counts into stat views (views needing the whole variant data are skipped like stream mode)
+     --partition-by KEY  'country' (default) or 'continent' (hash of the name), or 'date' (ranges of collection date)
+     --shard-step STEP   run only 'split', 'process' or 'merge' step of partitioned mode, ex. to process shards on nodes sharing data folder
+     --shard-ids K[,K...]  shards aggregated by --shard-step process (default: all)
+     --memory-budget MB  memory shared by data sets processed together, which run concurrently within it (default: physical memory)
+     --workers N         number of worker processes to run stat views in parallel (default: 1)
+     --no-cache          always parse input files, parsed inputs are cached in data/{version}/{dataset}/cache by default
+     --output FORMAT     'wide' (default), 'sparse' or 'both', see runStatViews for sparse output files
+     --views V[,V...]    run only selected stat views, by No. (ex. 9), file name prefix (ex. 05_) or glob (ex. 0[57]_country_*)
+     --views-from-stat-js  run only stat views loaded by tools/processors/stat.js
+     --json              write stat store payload loaded by the application into data/json/stat-{dataset}.json
+     --json-dir DIR      folder of stat store payload (default: data/json)
+     --no-csv            do not write CSV files, with --json
+     --top-n N           most frequent mutations of each region kept in prevalence tables (default: 100, 0 for all)
+     --min-prevalence F  mutations less frequent than F in the region are dropped from prevalence tables (default: 0)
+     --cooccurrence      also run co-occurrence tables No.28-29, which are run only with it or when selected by --views
+     --min-support N     mutation pairs found in less samples of the region in the month are dropped from co-occurrence tables (default: 10)
+     --daily-index       save cumulative daily counts of time series into Stat-{dataset}/daily_index, to count any date range
+     --compress C        compress CSV files with 'gzip' or 'zstd' (*.csv.gz, *.csv.zst), tools/processors/stat.js reads uncompressed files only
+     --writer-threads N  threads formatting and compressing blocks of each CSV file (default: 1)
+     --profile-view N    profile No.N stat view with cProfile (or pyinstrument when --profiler pyinstrument is given)
+   Only input files needed by the selected stat views are loaded.
+   CSV files whose content is unchanged since the previous run keep their time stamp (they are still written into a temporary file to compare),
+   see Stat-{dataset}/output_hashes.json
+   Time, rows and memory of each step and stat view are written into Stat-{dataset}/run_report_{version}_{dataset}.json
 
 """
 
@@ -26,36 +85,260 @@ def fileCheck(fn):
       print("Error: File "+ fn + " does not appear to exist.")
       return 0
 
+#----------------------------------------------------------------------------------------------------------
+
+# declared columns and dtypes of input files, other columns are not loaded
+#   'category' is used for repetitive strings, Collection_Date is parsed into 'date' column at read time
+
+sampleSchema = {'Sample': 'object', 'Collection_Date': 'category', 'Geo_Region': 'category', 'Geo_Country': 'category', 'Geo_City': 'category'}
+variantSchema = {'Sample': 'category', 'Mutation': 'category', 'Gene': 'category', 'Protein': 'category'}
+cladeSchema = {'Sample': 'category', 'Detail': 'category'}
+
+# aggregation cube built from each variant/clade input: (schema, index, attributes)
+cubeInputs = {
+    'variant': (variantSchema, 'Mutation', ['Gene', 'Protein']),
+    'clade': (cladeSchema, 'Detail', []),
+}
+
+# other column names used in input files
+columnAliases = {'sample': 'Sample'}
+
+def loadTable(filePath, schema):
+    dtype, aliases = getReadOptions(schema)
+    data = pd.read_csv(filePath, delimiter ='\t', usecols=lambda column: column in dtype, dtype=dtype)
+
+    return prepareTable(data, aliases)
+
+# load file as chunks of at most chunkSize rows
+def loadTableChunks(filePath, schema, chunkSize):
+    dtype, aliases = getReadOptions(schema)
+    for chunk in pd.read_csv(filePath, delimiter ='\t', usecols=lambda column: column in dtype, dtype=dtype, chunksize=chunkSize):
+        yield prepareTable(chunk, aliases)
+
+def getReadOptions(schema):
+    aliases = {alias: column for alias, column in columnAliases.items() if column in schema}
+    dtype = dict(schema)
+    dtype.update({alias: schema[column] for alias, column in aliases.items()})
+
+    return dtype, aliases
+
+def prepareTable(data, aliases):
+    data = data.rename(columns=aliases)
+    if 'Collection_Date' in data:
+        data['date'] = parseDateColumn(data['Collection_Date'])
+
+    return data
+
+#----------------------------------------------------------------------------------------------------------
+# parse each distinct date only once
+def parseDateColumn(column):
+    if column.dtype.name != 'category':
+        return pd.to_datetime(column)
+
+    # code -1 (missing date) picks NaT appended at the end
+    dates = np.append(pd.to_datetime(column.cat.categories).values, np.datetime64('NaT', 'ns'))
+    return pd.Series(dates[column.cat.codes.values], index=column.index)
+
+#----------------------------------------------------------------------------------------------------------
+# fill missing values with 'unknown', categorical columns need 'unknown' in their categories
+def fillUnknown(column):
+    if column.dtype.name == 'category' and 'unknown' not in column.cat.categories:
+        column = column.cat.add_categories('unknown')
+
+    return column.fillna('unknown')
+
+def fillUnknownColumns(data):
+    # only string columns are filled, missing period codes are handled by aggregation cube
+    for column in data.columns[data.isnull().any()]:
+        if data[column].dtype.name in ('object', 'category'):
+            data[column] = fillUnknown(data[column])
+
+    return data
+
+#----------------------------------------------------------------------------------------------------------
+
+# periods are kept as integer codes, labels are made only for columns of output tables
+#   YearMonthDay = days since 1970/01/01
+#   Week = weeks since the week ending Sunday 1970/01/04 (1970/01/01 is Thursday, so day + 3 starts each week on Monday)
+#   YearMonth = months since 1970/01
+
+missingPeriodCode = np.iinfo(np.int32).min
+
+def formatPeriodLabels(codes, period):
+    codes = np.asarray(codes, dtype=np.int64)
+    if len(codes) == 0 or codes.min() == missingPeriodCode:
+        return formatPeriodCodes(codes, period)
+
+    # cache is extended to codes out of its range, so that later tables of this process find them
+    firstCode, labels = periodLabelCache.get(period, (codes.min(), np.array([], dtype=object)))
+    if codes.min() < firstCode or codes.max() >= firstCode + len(labels):
+        lastCode = max(firstCode + len(labels), codes.max() + 1)
+        firstCode = min(firstCode, codes.min())
+        labels = np.asarray(formatPeriodCodes(np.arange(firstCode, lastCode), period), dtype=object)
+        periodLabelCache[period] = (firstCode, labels)
+
+    return pd.Index(labels[codes - firstCode])
+
+def formatPeriodCodes(codes, period):
+    if (period == 'YearMonth'):
+        return pd.DatetimeIndex(codes.astype('datetime64[M]')).strftime('%Y/%m')
+    if (period == 'Week'):
+        # label of week is its Sunday
+        codes = codes * 7 + 3
+
+    return pd.DatetimeIndex(codes.astype('datetime64[D]')).strftime('%Y/%m/%d')
+
+# labels of each period, {period: (first code, labels)}
+#   made in advance up to today before processes are forked, and extended when a table has periods out of it
+periodLabelCache = {}
+
+def buildPeriodLabelCache(firstDate='2019-12-01', lastDate=None):
+    firstDay = getDayCode(firstDate)
+    lastDay = getDayCode(lastDate or datetime.date.today().isoformat())
+    days = np.arange(firstDay, max(lastDay, firstDay) + 1)
+    codes = {'YearMonthDay': days, 'Week': np.unique((days + 3) // 7),
+             'YearMonth': np.unique(days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64))}
+    for period, periodCodes in codes.items():
+        periodLabelCache[period] = (periodCodes[0], np.asarray(formatPeriodCodes(periodCodes, period), dtype=object))
+
 #----------------------------------------------------------------------------------------------------------
 def dateProcess(data):
-    data['Geo_Country'] = data['Geo_Country'].fillna('unknown')   
-    data['Geo_Region'] = data['Geo_Region'].fillna('unknown')
-    data['Geo_City'] = data['Geo_City'].fillna('unknown')
-    data['date'] = pd.to_datetime(data['Collection_Date'])
+    data['Geo_Country'] = fillUnknown(data['Geo_Country'])
+    data['Geo_Region'] = fillUnknown(data['Geo_Region'])
+    data['Geo_City'] = fillUnknown(data['Geo_City'])
+    if 'date' not in data:
+        data['date'] = pd.to_datetime(data['Collection_Date'])
+    missingDate = data['date'].isnull().values
+    days = data['date'].values.astype('datetime64[D]').astype(np.int64)
+    months = data['date'].values.astype('datetime64[M]').astype(np.int64)
     #add column for processing monthly data
-    data['YearMonth'] = data['date'].dt.strftime('%Y/%m') 
+    data['YearMonth'] = np.where(missingDate, missingPeriodCode, months).astype(np.int32)
     #add column for processing daily data
-    data['YearMonthDay'] = data['date'].dt.strftime('%Y/%m/%d') 
+    data['YearMonthDay'] = np.where(missingDate, missingPeriodCode, days).astype(np.int32)
     #add column for processing weekly data (Sunday based)
-    data['Weekday'] = data['date'].dt.dayofweek
-    data['Week'] = (data['date'] - pd.to_timedelta(data['Weekday'] - 6,unit='d')).dt.strftime('%Y/%m/%d')
+    data['Week'] = np.where(missingDate, missingPeriodCode, (days + 3) // 7).astype(np.int32)
     #add cloum for counting
     data['count'] = 1
 
     return data
     
 #----------------------------------------------------------------------------------------------------------
-def createDateColumns(start,end,period):
 
-    if (period == 'YearMonth'):
-        column = pd.date_range(start = start , end = end, freq ='MS').strftime('%Y/%m')
-    elif (period == 'YearMonthDay'):
-        column = pd.date_range(start = start , end = end, freq ='D').strftime('%Y/%m/%d')
-    elif (period == 'Week'):
-        column = pd.date_range(start = start , end = end, freq ='W').strftime('%Y/%m/%d')      
-    tempdata = pd.DataFrame(columns = column )
+# cache of parsed (and pre-processed) input tables, re-runs with unchanged input files skip parsing
+#   each table is stored in its own folder as one NumPy file per column, which is memory-mapped on load
+#   categorical/object columns are stored as codes with categories in columns.json
+#   key.json holds size, mtime and sha1 of source file, cache is used only when they match
+
+cacheFolderName = 'cache'
+# increment when format of cached tables or pre-process changes
+cacheFormatVersion = 2
+
+def loadCachedTable(filePath, schema, cacheFolder, preprocess=None):
+    tableFolder = os.path.join(cacheFolder, os.path.basename(filePath))
+    tableKey = {'format': cacheFormatVersion, 'schema': schema, 'preprocess': preprocess.__name__ if preprocess else None}
+
+    data = readCachedTable(tableFolder, filePath, tableKey)
+    if data is not None:
+        print("Cache hit: " + filePath)
+        return data
+
+    data = loadTable(filePath, schema)
+    if preprocess:
+        data = preprocess(data)
+    try:
+        writeCachedTable(tableFolder, filePath, tableKey, data)
+    except (IOError, OSError) as e:
+        print("Warning: could not write cache of " + filePath + ": " + str(e))
+
+    return data
+
+def hashFile(filePath):
+    sha1 = hashlib.sha1()
+    with open(filePath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+
+    return sha1.hexdigest()
+
+def readCachedTable(tableFolder, filePath, tableKey):
+    keyPath = os.path.join(tableFolder, 'key.json')
+    try:
+        with open(keyPath) as f:
+            key = json.load(f)
+    except (IOError, ValueError):
+        return None
+
+    stat = os.stat(filePath)
+    if any(key.get(name) != value for name, value in tableKey.items()) or key['size'] != stat.st_size:
+        return None
+    if key['mtime'] != stat.st_mtime:
+        # file was touched or copied, content decides
+        if key['sha1'] != hashFile(filePath):
+            return None
+        key['mtime'] = stat.st_mtime
+        with open(keyPath, 'w') as f:
+            json.dump(key, f)
+
+    return readTableColumns(tableFolder)
+
+def writeCachedTable(tableFolder, filePath, tableKey, data):
+    os.makedirs(tableFolder, exist_ok=True)
+    # key is written last, a partially written table is never used
+    keyPath = os.path.join(tableFolder, 'key.json')
+    if os.path.exists(keyPath):
+        os.remove(keyPath)
+
+    writeTableColumns(tableFolder, data)
+
+    stat = os.stat(filePath)
+    key = dict(tableKey, size=stat.st_size, mtime=stat.st_mtime, sha1=hashFile(filePath))
+    with open(keyPath, 'w') as f:
+        json.dump(key, f)
+
+# table stored as one NumPy file per column, also used for saved state (see saveRunState)
+def readTableColumns(tableFolder):
+    try:
+        with open(os.path.join(tableFolder, 'columns.json')) as f:
+            columns = json.load(f)
+    except (IOError, ValueError):
+        return None
+
+    data = pd.DataFrame()
+    for column in columns:
+        values = np.load(os.path.join(tableFolder, column['file']), mmap_mode='r')
+        if column['kind'] == 'category' or column['kind'] == 'object':
+            values = pd.Categorical.from_codes(values, column['categories'])
+            if column['kind'] == 'object':
+                values = values.astype(object)
+        data[column['name']] = values
+
+    return data
+
+def writeTableColumns(tableFolder, data):
+    os.makedirs(tableFolder, exist_ok=True)
+    columns = []
+    for number, name in enumerate(data.columns):
+        column = {'name': name, 'kind': data[name].dtype.name, 'file': str(number) + '.npy'}
+        values = data[name]
+        if column['kind'] == 'object':
+            # categories in order of appearance, sorting them is not needed
+            codes, categories = pd.factorize(values)
+            values = pd.Series(pd.Categorical.from_codes(codes, categories))
+        if values.dtype.name == 'category':
+            column['kind'] = 'category' if column['kind'] == 'category' else 'object'
+            column['categories'] = values.cat.categories.tolist()
+            values = values.cat.codes
+        np.save(os.path.join(tableFolder, column['file']), values.values)
+        columns.append(column)
+    with open(os.path.join(tableFolder, 'columns.json'), 'w') as f:
+        json.dump(columns, f)
 
-    return tempdata
+#----------------------------------------------------------------------------------------------------------
+# get dense period codes between start and end, codes of consecutive periods are consecutive integers
+def createDateColumns(start,end,period):
+    column = np.arange(int(start), int(end) + 1)
+
+    return column
 
 
 #----------------------------------------------------------------------------------------------------------
@@ -67,501 +350,1782 @@ def createDateColumns(start,end,period):
 #   period = {'YearMonth','YearMonthDay', 'Week'} 
 
 def processTargetCountByPeriod(data, selectRange, index, period):   
-    # get uniqued country/continent List for looping
-    itemList = data[selectRange].unique()   
-    itemList.sort(axis=0) 
-    
-    mergedCountResult = createDateColumns(data[period].min(),data[period].max(), period )
-    mergedColumn = pd.DataFrame()
-
-    # get time series count table for certain country/continent and merge all the result
-    for item in itemList:
-        # extract data of certain country/continent
-        tempList = data[selectRange] == item
-        tempData = data[tempList]
-        # get time series count table
-        tempCountResult = pd.pivot_table(tempData , values='count', index=index, columns=period, aggfunc='count', fill_value=0 )
-        # merge result
-        mergedCountResult = pd.concat([mergedCountResult, tempCountResult], sort=True)
-        # create country/continent column
-        tempColumn = pd.DataFrame(index=range(len(tempCountResult)))
-        tempColumn[selectRange] = item
-        mergedColumn = pd.concat([mergedColumn, tempColumn], sort=True)
-
-    # insert index name into data
-    mergedCountResult.insert(0, index, mergedCountResult.index)
-    # reset index for merging
-    mergedCountResult = mergedCountResult.reset_index(drop=True)
-    mergedColumn = mergedColumn.reset_index(drop=True)
-    # insert country/continent column into data
-    mergedCountResult.insert(0, selectRange, mergedColumn)
-    # fill NA with 0
-    mergedCountResult = mergedCountResult.fillna('0') 
+    data = data[data[period] != missingPeriodCode]
+    # count every (country/continent, item, period) combination in a single grouped pass
+    countResult = data.groupby([selectRange, index, period], sort=False, observed=True).size()
+    # categorical levels would be sorted by order of categories, sort by their values instead
+    levels = [countResult.index.get_level_values(level) for level in range(countResult.index.nlevels)]
+    levels = [level.astype(object) if level.dtype.name == 'category' else level for level in levels]
+    countResult.index = pd.MultiIndex.from_arrays(levels, names=countResult.index.names)
+    countResult = countResult.sort_index()
+
+    return createCountTable(countResult, period, data[period].min(), data[period].max())
+
+#----------------------------------------------------------------------------------------------------------
+
+# get count of samples having both items of each item pair, for each country/continent and period
+#   data = mergedVariantData (or any data with Sample, selectRange, index and period columns)
+#   minSupport = pairs found in less samples of the country/continent and period are dropped
+#   output = (selectRange, period, index_1, index_2, count, count_1, count_2), count_1/count_2 = samples having each item
+
+def processTargetCooccurrenceByPeriod(data, selectRange, index, period, minSupport):
+    data = data[data[period] != missingPeriodCode]
+    # rows are coded as integers, a sample found in several rows of sample data may belong to several (country/continent, period) groups
+    groupNumbers = data.groupby([selectRange, period], sort=False, observed=True).ngroup().values
+    groups = data[[selectRange, period]].iloc[np.unique(groupNumbers, return_index=True)[1]]
+    sampleNumbers = pd.factorize(pd.factorize(data['Sample'])[0].astype(np.int64) * (len(groups) + 1) + groupNumbers)[0]
+    # items are coded in sorted order, so that item1 < item2 of each pair
+    itemNumbers, items = pd.factorize(data[index], sort=True)
+
+    pairCount, itemCount = countItemPairs(groupNumbers, sampleNumbers, itemNumbers, len(items), minSupport)
+
+    pairGroups = groups.iloc[pairCount['group'].values]
+    table = pd.DataFrame({
+        selectRange: pairGroups[selectRange].astype(object).values,
+        period: formatPeriodLabels(pairGroups[period].values, period),
+        index + '_1': np.asarray(items, dtype=object)[pairCount['item1'].values],
+        index + '_2': np.asarray(items, dtype=object)[pairCount['item2'].values],
+        'count': pairCount['count'].values,
+    })
+    table['count_1'] = itemCount.reindex(pd.MultiIndex.from_arrays([pairCount['group'], pairCount['item1']])).values
+    table['count_2'] = itemCount.reindex(pd.MultiIndex.from_arrays([pairCount['group'], pairCount['item2']])).values
+
+    return table.sort_values([selectRange, period, index + '_1', index + '_2']).reset_index(drop=True)
+
+# count item pairs of each group with the sample x item incidence matrix in compressed sparse rows (CSR),
+# which is the upper triangle of the sparse product (incidence.T x incidence) of each group
+#   groupNumbers, sampleNumbers, itemNumbers = integer codes of each row, itemTotal = number of item codes
+#   returns pairCount = (group, item1, item2, count) with item1 < item2, itemCount = samples of each (group, item)
+
+# pairs enumerated at once, bounds memory of pair keys
+pairChunkSize = 20000000
+
+def countItemPairs(groupNumbers, sampleNumbers, itemNumbers, itemTotal, minSupport):
+    incidence = pd.DataFrame({'group': groupNumbers, 'sample': sampleNumbers, 'item': itemNumbers}).drop_duplicates(['sample', 'item'])
+    itemCount = incidence.groupby(['group', 'item']).size()
+    # a pair is never found in more samples than each of its items, so rare items are dropped before pairing
+    frequent = incidence.groupby(['group', 'item'])['sample'].transform('size').values >= minSupport
+    incidence = incidence[frequent].sort_values(['sample', 'item'])
+
+    # compressed sparse rows, items of each sample are consecutive in columns
+    samples = incidence['sample'].values
+    columns = incidence['item'].values.astype(np.int64)
+    elementGroups = incidence['group'].values.astype(np.int64)
+    rowStarts = np.append(np.flatnonzero(np.append(True, samples[1:] != samples[:-1])), len(samples)) if len(samples) else np.zeros(1, dtype=np.int64)
+    # each element makes pairs with the following elements of its row
+    followers = np.repeat(rowStarts[1:], np.diff(rowStarts)) - np.arange(len(samples)) - 1
+
+    pairKeys = np.array([], dtype=np.int64)
+    pairCounts = np.array([], dtype=np.int64)
+    chunkKeys = []
+    chunkCounts = []
+    pairEnds = np.cumsum(followers)
+    chunkStarts = np.searchsorted(pairEnds, np.arange(0, pairEnds[-1], pairChunkSize), side='right') if len(samples) else []
+    for first, last in zip(chunkStarts, list(chunkStarts[1:]) + [len(samples)]):
+        firstElements = np.repeat(np.arange(first, last), followers[first:last])
+        pairStarts = np.repeat(np.cumsum(followers[first:last]) - followers[first:last], followers[first:last])
+        secondElements = firstElements + 1 + np.arange(len(firstElements)) - pairStarts
+        keys = (elementGroups[firstElements] * itemTotal + columns[firstElements]) * itemTotal + columns[secondElements]
+        chunkCount = pd.Series(keys).value_counts()
+        chunkKeys.append(chunkCount.index.values.astype(np.int64))
+        chunkCounts.append(chunkCount.values.astype(np.int64))
+        # chunk counts are added into running counts only when they outgrow them, like buildStreamingAggregationCube
+        if sum(len(chunkKey) for chunkKey in chunkKeys) >= len(pairKeys):
+            pairKeys, pairCounts = sumKeyCounts([pairKeys] + chunkKeys, [pairCounts] + chunkCounts)
+            chunkKeys, chunkCounts = [], []
+    pairKeys, pairCounts = sumKeyCounts([pairKeys] + chunkKeys, [pairCounts] + chunkCounts)
+    pairCount = pd.Series(pairCounts, index=pairKeys)
+    pairCount = pairCount[pairCount >= minSupport].sort_index()
+
+    # decode pair keys
+    keys = pairCount.index.values.astype(np.int64)
+    return pd.DataFrame({
+        'group': keys // (itemTotal * itemTotal),
+        'item1': keys // itemTotal % itemTotal,
+        'item2': keys % itemTotal,
+        'count': pairCount.values.astype(np.int64),
+    }), itemCount
+#----------------------------------------------------------------------------------------------------------
+
+# spread grouped counts into a time series count table with dense date columns
+#   countResult = count Series indexed by (selectRange, [index,] period)
+#   start, end = first and last period in data
+
+def createCountTable(countResult, period, start, end):
+    # get dense date columns between first and last period
+    dateColumns = createDateColumns(start, end, period)
+
+    # spread periods into columns, one row per (country/continent, item)
+    countResult = countResult.unstack(period, fill_value=0)
+    # add periods without any sample and keep columns in date order
+    countResult = countResult.reindex(columns=dateColumns, fill_value=0)
+    # label columns by date
+    countResult.columns = formatPeriodLabels(countResult.columns, period)
+    mergedCountResult = countResult.reset_index()
 
     return mergedCountResult
 
 #----------------------------------------------------------------------------------------------------------
 
-if __name__ == '__main__':
-   #
+# get long format table of non-zero counts, and dense period axis of the time series count table
+#   countResult = count Series indexed by (selectRange, [index,] period)
+#   start, end = first and last period in data
 
-    args = sys.argv
-    if len(args) < 3:
-        print('Syntax error')
-        sys.exit(1)
+def createSparseCountTable(countResult, period, start, end):
+    dateColumns = createDateColumns(start, end, period)
+    periodLabels = np.asarray(formatPeriodLabels(dateColumns, period))
 
-    version = args[1]
-    dataset = args[2]
+    # rollup only has combinations found in data, so every count is non-zero
+    countTable = countResult.to_frame('count').reset_index()
+    countTable[period] = periodLabels[countTable[period].values - dateColumns[0]]
+    periodAxis = pd.DataFrame({period: periodLabels})
 
-    inputFolder = os.path.join(os.getcwd(),"data",version,dataset )#".\\data" + os.path.sep + version + os.path.sep + dataset
-    outputFolder = os.path.join(os.getcwd(),"data",version,"Stat-"+dataset )#".\\data" + os.path.sep + version + os.path.sep + dataset
-    
-    sampleFilePath = inputFolder + os.path.sep + "samples_" + version + "_" +dataset + ".tsv"
-    variantFilePath = inputFolder + os.path.sep + "variant_" + version + "_" +dataset + ".tsv"
-    cladeFilePath = inputFolder + os.path.sep + "clade_" + version + "_" +dataset + ".tsv"
+    return countTable, periodAxis
 
-    # Check if files exist or not
-    if (fileCheck(sampleFilePath) == 0):
-        sys.exit(1)
-    if (fileCheck(variantFilePath) == 0):
-        sys.exit(1)
-    if (fileCheck(cladeFilePath) == 0):
-        sys.exit(1)
+#----------------------------------------------------------------------------------------------------------
 
-    sampleData =  pd.read_csv(sampleFilePath, delimiter ='\t')
-    variantData =  pd.read_csv(variantFilePath, delimiter ='\t')
-    cladeData =  pd.read_csv(cladeFilePath, delimiter ='\t')
+# aggregate data once at the finest grain (city x item x day) so that every stat view can be rolled up from it
+#   data = sampleData, mergedVariantData, mergedCladeData
+#   index = {None, 'Mutation', 'Detail'}
+#   attributes = columns carried along with index (ex. 'Gene', 'Protein' of 'Mutation')
 
-    # Make output folder
-    os.makedirs(outputFolder, exist_ok=True)
+cubeRangeColumns = ['Geo_Region', 'Geo_Country', 'Geo_City']
+cubePeriodColumns = ['YearMonthDay', 'Week', 'YearMonth']
 
-    # Data pre-process
-    sampleData = sampleData.rename(columns={'sample':'Sample'})
-    sampleData = dateProcess(sampleData)
+def getCubeKeys(index=None, attributes=()):
+    itemColumns = [index] + list(attributes) if index else []
 
-    mergedVariantData = pd.merge(variantData, sampleData, how='left', on ='Sample')
-    mergedVariantData = mergedVariantData.fillna('unknown')
-    mergedCladeData = pd.merge(cladeData, sampleData, how='left', on ='Sample')
-    mergedCladeData = mergedCladeData.fillna('unknown')
+    return cubeRangeColumns + itemColumns + cubePeriodColumns
 
-    # No.0 Stat view:  Basic info
-    try:
-        print("---------- Processing: No.0 Stat view ---------- ")
+def buildAggregationCube(data, index=None, attributes=()):
+    keys = getCubeKeys(index, attributes)
+    # keep rows without collection date (missing period code, or NaN for samples not found by merge),
+    # so that they are still counted for each country/continent
+    cubeData = data[keys].fillna({column: missingPeriodCode for column in cubePeriodColumns})
+    cubeData = cubeData.astype({column: np.int32 for column in cubePeriodColumns})
+    # week and month are derived from day, so grouping by them does not split any group further
+    cube = cubeData.groupby(keys, sort=False, observed=True).size().to_frame('count').reset_index()
+    # cube is small, plain strings keep rollups sorted in the same order as raw data
+    for column in cube.columns:
+        if cube[column].dtype.name == 'category':
+            cube[column] = cube[column].astype(object)
 
-        basicInfo = pd.DataFrame()
-        basicInfo = basicInfo.append(pd.Series(['Analyzed Date', datetime.datetime.now()]),ignore_index=True)
-        basicInfo = basicInfo.append(pd.Series(['Latest Collention Date', sampleData['Collection_Date'].max()]),ignore_index=True)
-        basicInfo = basicInfo.append(pd.Series(['Total Sample Number', len(sampleData)]),ignore_index=True)
-        basicInfo = basicInfo.append(pd.Series(['Total Variant Number', len(variantData['Mutation'].unique())]),ignore_index=True)
+    return cube
 
-        fileName = '00_basic_infomaction_'+version+'_'+dataset+'.csv'
-        basicInfo.to_csv(outputFolder + os.path.sep + fileName, index=False)
+#----------------------------------------------------------------------------------------------------------
 
-        print("---------- Done: No.0 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.0 Stat view ")
-        traceback.print_exc()
+# sample lookup table, variant/clade rows are aggregated through it instead of joining sample data onto them
+#   each sample is mapped to a cell, a distinct combination of cube keys of sample data (region and period codes)
+#   sampleIndex = names of samples, sampleCells = cell number of each sample (of its first row)
+#   cells = cube keys of each cell, the last cell holds keys of samples not found in sample data
+#   duplicateCells = (positions in sampleIndex, cell numbers) of the other rows of samples found in several rows,
+#     a variant/clade row is counted once for each row of its sample, like a left merge with sample data
+
+def buildSampleLookup(sampleData):
+    keyData = sampleData[cubeRangeColumns + cubePeriodColumns]
+    rowCells = keyData.groupby(cubeRangeColumns + cubePeriodColumns, sort=False, observed=True).ngroup().values
+    _, firstRows = np.unique(rowCells, return_index=True)
+
+    cells = keyData.iloc[firstRows].reset_index(drop=True)
+    for column in cubeRangeColumns:
+        cells[column] = cells[column].astype(object)
+    missingCell = dict({column: 'unknown' for column in cubeRangeColumns}, **{column: missingPeriodCode for column in cubePeriodColumns})
+    cells = pd.concat([cells, pd.DataFrame([missingCell])], ignore_index=True, sort=False)
+    cells = cells.astype({column: np.int32 for column in cubePeriodColumns})
+
+    # sample names are accession IDs, but a sample found in several rows is counted in each of them
+    duplicated = sampleData['Sample'].duplicated().values
+    sampleIndex = pd.Index(sampleData['Sample'].values[~duplicated])
+    duplicateSamples = sampleIndex.get_indexer(sampleData['Sample'].values[duplicated])
+    order = np.argsort(duplicateSamples, kind='stable')
+    duplicateCells = (duplicateSamples[order], rowCells[duplicated][order].astype(np.int32))
+
+    return sampleIndex, rowCells[~duplicated].astype(np.int32), cells, duplicateCells
+
+# get cell of each row from its sample, rows of unknown samples get the last cell
+def lookupSampleCells(samples, sampleLookup):
+    sampleIndex, sampleCells, cells, _ = sampleLookup
+    # position -1 of sample not found picks the last cell
+    sampleCells = np.append(sampleCells, len(cells) - 1)
+
+    return sampleCells[getSamplePositions(samples, sampleIndex)]
+
+# get other cells of rows whose sample is found in several rows of sample data
+#   returns (row positions, cells), a row is repeated once for each of the other rows of its sample
+def lookupDuplicateCells(samples, sampleLookup):
+    sampleIndex, _, _, (duplicateSamples, duplicateCells) = sampleLookup
+    if len(duplicateSamples) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int32)
+
+    return expandDuplicateValues(getSamplePositions(samples, sampleIndex), duplicateSamples, duplicateCells)
+
+# repeat each position once for each of its other values
+#   duplicatePositions = sorted positions having other values, duplicateValues = their values in the same order
+#   returns (row of each repeated position, its value)
+def expandDuplicateValues(positions, duplicatePositions, duplicateValues):
+    starts = np.searchsorted(duplicatePositions, positions, side='left')
+    repeats = np.searchsorted(duplicatePositions, positions, side='right') - starts
+    rows = np.repeat(np.arange(len(positions)), repeats)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+
+    return rows, duplicateValues[np.repeat(starts, repeats) + offsets]
+
+# position of each sample in sampleIndex, -1 for samples not found
+def getSamplePositions(samples, sampleIndex):
+    if samples.dtype.name == 'category':
+        # look up each distinct sample once, code -1 (missing sample) picks the last position
+        categoryPositions = np.append(sampleIndex.get_indexer(samples.cat.categories), -1)
+        return categoryPositions[samples.cat.codes.values]
+
+    return sampleIndex.get_indexer(samples)
+
+# build aggregation cube of variant/clade data through sample lookup table, same result as
+# buildAggregationCube(fillUnknownColumns(pd.merge(data, sampleData, how='left', on='Sample')), index, attributes)
+def buildIndexedAggregationCube(data, sampleLookup, index, attributes=()):
+    itemColumns = [index] + list(attributes)
+    cells = sampleLookup[2]
+    cellCount = countCellItems(data, sampleLookup, itemColumns)
+
+    # cube keys of each cell are picked by position
+    cube = cells.iloc[cellCount['cell'].values].reset_index(drop=True)
+    for column in itemColumns:
+        cube[column] = cellCount[column].astype(object).values
+    cube['count'] = cellCount['count'].values
+
+    return cube[getCubeKeys(index, attributes) + ['count']]
+
+# count rows of each (cell, item), returns columns 'cell', itemColumns and 'count'
+def countCellItems(data, sampleLookup, itemColumns):
+    cellData = pd.DataFrame({'cell': lookupSampleCells(data['Sample'], sampleLookup)}, index=data.index)
+    for column in itemColumns:
+        cellData[column] = fillUnknown(data[column])
+    # rows of samples found in several rows of sample data are added again with their other cells
+    duplicateRows, duplicateCells = lookupDuplicateCells(data['Sample'], sampleLookup)
+    if len(duplicateRows):
+        duplicateData = cellData.iloc[duplicateRows].assign(cell=duplicateCells)
+        cellData = pd.concat([cellData, duplicateData], ignore_index=True, sort=False)
+
+    return cellData.groupby(['cell'] + itemColumns, sort=False, observed=True).size().to_frame('count').reset_index()
 
-    # No.16 Stat view:  Mutation variant in each Gene
-    try:
-        print("---------- Processing: No.16 Stat view ---------- ")
-
-        selectRange = 'Gene'
-        index = 'Mutation'
-        period = 'YearMonth'
-        mergedVariantCountByMonth = processTargetCountByPeriod(mergedVariantData, selectRange, index, period)
-        fileName = '00_gene_variant_'+version+'_'+dataset+'.csv'
-        mergedVariantCountByMonth[[selectRange,index]].to_csv(outputFolder + os.path.sep + fileName, index=False)
-        print("---------- Done: No.16 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.16 Stat view ")
-        traceback.print_exc()
+#----------------------------------------------------------------------------------------------------------
 
-    # No.17 Stat view:  Mutation variant in sub gene of ORF1ab
-    try:
-        print("---------- Processing: No.17 Stat view ---------- ")
-        selectGene = 'ORF1ab'
-        selectRange = 'Protein'
-        index = 'Mutation'
-        period = 'YearMonth'
-
-        selectGeneList = mergedVariantData['Gene'] == selectGene
-        selectGeneData = mergedVariantData[selectGeneList]
-        
-        mergedVariantCountEachSubGeneByMonth = processTargetCountByPeriod(selectGeneData, selectRange, index, period)
-        fileName = '00_' + selectGene + '_sub_variant_'+version+'_'+dataset+'.csv'
-        mergedVariantCountEachSubGeneByMonth[[selectRange,index]].to_csv(outputFolder + os.path.sep + fileName, index=False)
-        print("---------- Done: No.17 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.17 Stat view ")
-        traceback.print_exc()
+# build aggregation cube from chunks of variant/clade data without holding the whole data
+#   chunks = loadTableChunks(variantFilePath, ...), loadTableChunks(cladeFilePath, ...)
+#   sampleData = pre-processed sample data used as lookup table
+
+#   counts are summed up by integer key of (cell, item), key = cell << 32 | item number
+#   items = distinct items found in chunks so far, item columns joined by tab which is never found in a field of TSV file
+
+def buildStreamingAggregationCube(chunks, sampleData, index=None, attributes=()):
+    itemColumns = [index] + list(attributes)
+    sampleLookup = buildSampleLookup(sampleData)
+    cells = sampleLookup[2]
+
+    items = pd.Index([], dtype=object)
+    keys = np.array([], dtype=np.int64)
+    counts = np.array([], dtype=np.int64)
+    chunkKeys = []
+    chunkCounts = []
+    for chunk in chunks:
+        cellCount = countCellItems(chunk, sampleLookup, itemColumns)
+        # item number of each distinct item of chunk, new items are appended to items
+        chunkItemNumbers = cellCount.groupby(itemColumns, sort=False, observed=True).ngroup().values
+        _, firstRows = np.unique(chunkItemNumbers, return_index=True)
+        chunkItemTable = cellCount[itemColumns].iloc[firstRows]
+        chunkItems = chunkItemTable[itemColumns[0]].astype(str).values.astype(object)
+        for column in itemColumns[1:]:
+            chunkItems = chunkItems + '\t' + chunkItemTable[column].astype(str).values.astype(object)
+        chunkItems = pd.Index(chunkItems)
+        itemNumbers = items.get_indexer(chunkItems)
+        items = items.append(chunkItems[itemNumbers < 0])
+        itemNumbers[itemNumbers < 0] = np.arange(len(items) - (itemNumbers < 0).sum(), len(items))
+
+        chunkKeys.append((cellCount['cell'].values.astype(np.int64) << 32) | itemNumbers[chunkItemNumbers])
+        chunkCounts.append(cellCount['count'].values.astype(np.int64))
+        # chunk counts are added into running counts only when they outgrow them,
+        # so that running counts are summed up again a few times instead of once per chunk
+        if sum(len(chunkKey) for chunkKey in chunkKeys) >= len(keys):
+            keys, counts = sumKeyCounts([keys] + chunkKeys, [counts] + chunkCounts)
+            chunkKeys, chunkCounts = [], []
+    keys, counts = sumKeyCounts([keys] + chunkKeys, [counts] + chunkCounts)
+
+    # cube keys of each cell are picked by position, items are split into their columns
+    cube = cells.iloc[keys >> 32].reset_index(drop=True)
+    itemTable = pd.Series(items, dtype=object).str.split('\t')
+    itemNumbers = keys & 0xffffffff
+    for number, column in enumerate(itemColumns):
+        cube[column] = itemTable.str[number].values.astype(object)[itemNumbers]
+    cube['count'] = counts
+
+    return cube[getCubeKeys(index, attributes) + ['count']]
+
+def sumKeyCounts(keys, counts):
+    counts = pd.Series(np.concatenate(counts)).groupby(np.concatenate(keys), sort=False).sum()
+
+    return counts.index.values.astype(np.int64), counts.values.astype(np.int64)
+
+# sum up counts of aggregation cubes built from different parts of the same input
+def mergeAggregationCubes(cubes):
+    cube = pd.concat(cubes, ignore_index=True, sort=False)
+    cube['count'] = cube['count'].astype(np.int64)
+    keys = [column for column in cube.columns if column != 'count']
+
+    return cube.groupby(keys, sort=False)['count'].sum().reset_index()
 
-        selectRange = 'Geo_Region'
-        index = 'Mutation'
-        period = 'YearMonth'
-        mergedVariantCountByMonth = processTargetCountByPeriod(mergedVariantData, selectRange, index, period)
-        fileName = '03_continent_variants_month_'+version+'_'+dataset+'.csv'
-        mergedVariantCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
+#----------------------------------------------------------------------------------------------------------
 
-        print("---------- Done: No.5 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.5 Stat view ")
-        traceback.print_exc()
-        
-    # No.1 Stat view:  Count of each continent
-    try:
-        print("---------- Processing: No.1 Stat view ---------- ")
+# state of a run kept for incremental processing of next version
+#   manifest = cube keys of each sample, to find added/removed samples and to subtract removed ones
+#   cubes = aggregation cube of each input
+#   each table is stored as binary columns in its own folder (see writeTableColumns), state.json is written last
 
-        index = 'Geo_Region'
-        continentCount = sampleData[index].value_counts().sort_index()
-        continentCount = continentCount.to_frame('count')
-        continentCount.insert(0, index, continentCount.index)
-        fileName = '01_continent_samples_'+version+'_'+dataset+'.csv'
-        continentCount.to_csv(outputFolder + os.path.sep + fileName, index=False)
+stateFolderName = 'state'
+# increment when format of saved state changes
+stateFormatVersion = 3
+manifestColumns = ['Sample'] + cubeRangeColumns + cubePeriodColumns
 
-        print("---------- Done: No.1 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.1 Stat view ")
-        traceback.print_exc()
+def getSampleManifest(sampleData):
+    manifest = sampleData[manifestColumns].copy()
+    for column in cubeRangeColumns:
+        manifest[column] = manifest[column].astype(object)
 
-    # No.2 Stat view data:  Count of each country
-    try:
-        print("---------- Processing: No.2 Stat view ---------- ")
+    return manifest
 
-        index = 'Geo_Country'
-        countryCount = sampleData[index].value_counts().sort_index()
-        countryCount = countryCount.to_frame('count')
-        countryCount.insert(0, index, countryCount.index)
-        header =['count']
-        fileName = '01_country_samples_'+version+'_'+dataset+'.csv'
-        countryCount.to_csv(outputFolder + os.path.sep + fileName, index=False)
+def saveRunState(stateFolder, sampleData, cubes):
+    os.makedirs(stateFolder, exist_ok=True)
+    statePath = os.path.join(stateFolder, 'state.json')
+    if os.path.exists(statePath):
+        os.remove(statePath)
 
-        print("---------- Done: No.2 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.2 Stat view ")
-        traceback.print_exc()
+    writeTableColumns(os.path.join(stateFolder, 'manifest'), getSampleManifest(sampleData))
+    for name, cube in cubes.items():
+        writeTableColumns(os.path.join(stateFolder, name + '_cube'), cube)
+    with open(statePath, 'w') as f:
+        json.dump({'format': stateFormatVersion}, f)
 
-    # No.18 Stat view data:  Count of each city
+def loadRunState(stateFolder, names):
     try:
-        print("---------- Processing: No.18 Stat view ---------- ")
+        with open(os.path.join(stateFolder, 'state.json')) as f:
+            stateFormat = json.load(f)['format']
+    except (IOError, ValueError, KeyError):
+        stateFormat = None
+    if stateFormat != stateFormatVersion:
+        raise ValueError('State in ' + stateFolder + ' was saved in another format, run the previous version again with --save-state')
 
-        index = 'Geo_City'
-        countryCount = sampleData[index].value_counts().sort_index()
-        countryCount = countryCount.to_frame('count')
-        countryCount.insert(0, index, countryCount.index)
-        header =['count']
-        fileName = '01_city_samples_'+version+'_'+dataset+'.csv'
-        countryCount.to_csv(outputFolder + os.path.sep + fileName, index=False)
+    manifest = readTableColumns(os.path.join(stateFolder, 'manifest'))
+    cubes = {name: loadStateCube(stateFolder, name) for name in names}
 
-        print("---------- Done: No.18 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.18 Stat view ")
-        traceback.print_exc()
+    return manifest, cubes
 
-    # No.3 Stat view data:   Count of each continent by month
-    try:
-        print("---------- Processing: No.3 Stat view ---------- ")
-
-        index = 'Geo_Region'
-        period = 'YearMonth'
-        continentCountByMonth = createDateColumns(sampleData[period].min(),sampleData[period].max(), period )
-        tempContinentCountByMonth = pd.pivot_table(sampleData, values='count', index=index , columns=period, aggfunc='count', fill_value=0 )
-        continentCountByMonth = pd.concat([continentCountByMonth, tempContinentCountByMonth], sort=True)
-        continentCountByMonth = continentCountByMonth.fillna('0') 
-        continentCountByMonth.insert(0, index, continentCountByMonth.index)
-        fileName = '02_continent_samples_collection_month_'+version+'_'+dataset+'.csv'
-        continentCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
-
-        print("---------- Done: No.3 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.3 Stat view ")
-        traceback.print_exc()
+def loadStateCube(stateFolder, name):
+    cube = readTableColumns(os.path.join(stateFolder, name + '_cube'))
+    if cube is None:
+        raise ValueError('State in ' + stateFolder + ' has no ' + name + ' cube, run the previous version again with --save-state')
 
-    # No.4 Stat view data:   Count of each country by month
-    try:
-        print("---------- Processing: No.4 Stat view ---------- ")
-
-        index = 'Geo_Country'
-        period = 'YearMonth'
-        countryCountByMonth = createDateColumns(sampleData[period].min(),sampleData[period].max(), period )
-        tempCountryCountByMonth = pd.pivot_table(sampleData, values = 'count', index=index , columns=period, aggfunc='count', fill_value=0 )
-        countryCountByMonth = pd.concat([countryCountByMonth, tempCountryCountByMonth], sort=True)
-        countryCountByMonth = countryCountByMonth.fillna('0') 
-        countryCountByMonth.insert(0, index, countryCountByMonth.index)
-        fileName = '02_country_samples_collection_month_'+version+'_'+dataset+'.csv'
-        countryCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
-
-        print("---------- Done: No.4 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.4 Stat view ")
-        traceback.print_exc()
+    return cube
 
-    # No.19 Stat view data:   Count of each city by month
+#----------------------------------------------------------------------------------------------------------
+
+# update aggregation cubes of previous version with samples added/removed since then
+#   samples whose cube keys changed are handled as removed and added again
+#   variant/clade rows of other samples are assumed to be unchanged
+#   only cubes loaded from state are updated
+#   inputFiles, previousInputFiles = {'variant': path, 'clade': path}
+#   cacheFolders = (cache folder, previous cache folder), rows are selected from cached tables
+#     by codes of their categorical Sample column, input files are read in chunks when it is None (--no-cache or --stream)
+
+def buildIncrementalAggregationCubes(state, sampleData, inputFiles, previousInputFiles, chunkSize, cacheFolders=None):
+    previousManifest, previousCubes = state
+    manifest = getSampleManifest(sampleData)
+
+    # samples found in only one of manifests
+    comparedManifest = pd.merge(previousManifest, manifest, how='outer', indicator=True)
+    removedManifest = comparedManifest[comparedManifest['_merge'] == 'left_only'][manifestColumns]
+    addedManifest = comparedManifest[comparedManifest['_merge'] == 'right_only'][manifestColumns]
+    print("Incremental update: " + str(len(addedManifest)) + " samples added, " + str(len(removedManifest)) + " samples removed")
+
+    # sample data and saved manifest hold cube keys, so they are used as lookup tables of added/removed samples
+    #   every row of a sample found in several rows is removed and added again when any of them changed
+    changedSamples = pd.concat([removedManifest['Sample'], addedManifest['Sample']], ignore_index=True).unique()
+    addedLookup = sampleData[sampleData['Sample'].isin(changedSamples)]
+    removedLookup = previousManifest[previousManifest['Sample'].isin(changedSamples)]
+
+    cubes = {}
+    if 'sample' in previousCubes:
+        cubes['sample'] = applyCubeDelta(previousCubes['sample'], buildAggregationCube(addedLookup), buildAggregationCube(removedLookup))
+    for name, (schema, index, attributes) in cubeInputs.items():
+        if name not in previousCubes:
+            continue
+        if cacheFolders:
+            addedCube = buildSampleRowCube(inputFiles[name], schema, cacheFolders[0], addedLookup, index, attributes)
+            removedCube = buildSampleRowCube(previousInputFiles[name], schema, cacheFolders[1], removedLookup, index, attributes)
+        else:
+            addedChunks = loadSampleRowChunks(inputFiles[name], schema, chunkSize, addedLookup['Sample'])
+            addedCube = buildStreamingAggregationCube(addedChunks, addedLookup, index, attributes)
+            removedChunks = loadSampleRowChunks(previousInputFiles[name], schema, chunkSize, removedLookup['Sample'])
+            removedCube = buildStreamingAggregationCube(removedChunks, removedLookup, index, attributes)
+        cubes[name] = applyCubeDelta(previousCubes[name], addedCube, removedCube)
+
+    return cubes
+
+# aggregate only rows of samples in lookup, file is not loaded at all when there is no sample
+def buildSampleRowCube(filePath, schema, cacheFolder, lookup, index, attributes):
+    if len(lookup) == 0:
+        return pd.DataFrame(columns=getCubeKeys(index, attributes) + ['count'])
+
+    data = loadCachedTable(filePath, schema, cacheFolder)
+    samples = data['Sample'].astype('category')
+    # category codes of given samples are marked, -1 (missing sample) picks the last mark
+    selected = np.append(samples.cat.categories.isin(lookup['Sample']), False)
+    rows = np.flatnonzero(selected[samples.cat.codes.values])
+
+    return buildIndexedAggregationCube(data.iloc[rows], buildSampleLookup(lookup), index, attributes)
+
+# load only rows of given samples, file is not read at all when there is no sample
+def loadSampleRowChunks(filePath, schema, chunkSize, sampleList):
+    if len(sampleList) == 0:
+        return
+
+    for chunk in loadTableChunks(filePath, schema, chunkSize):
+        yield chunk[chunk['Sample'].isin(sampleList)]
+
+# add counts of addedCube and subtract counts of removedCube
+def applyCubeDelta(cube, addedCube, removedCube):
+    removedCube = removedCube.assign(count=-removedCube['count'].astype(np.int64))
+    delta = mergeAggregationCubes([addedCube, removedCube])
+
+    # only rows whose every key is found in delta can change, other rows are kept as they are
+    rows = np.arange(len(cube))
+    for column in delta.columns.drop('count'):
+        rows = rows[pd.Series(cube[column].values[rows]).isin(delta[column].unique()).values]
+    changed = np.zeros(len(cube), dtype=bool)
+    changed[rows] = True
+    merged = mergeAggregationCubes([cube[changed], delta])
+    cube = pd.concat([cube[~changed], merged[merged['count'] != 0]], ignore_index=True, sort=False)
+
+    return cube
+
+#----------------------------------------------------------------------------------------------------------
+
+# partitioned execution, for data sets larger than memory of one process or node
+#   split: rows of input files are written into data/{version}/{dataset}/shards/{shard}, keyed by their sample
+#     partitionBy = 'country', 'continent' (hash of the name) or 'date' (ranges of collection date with about the same number of samples)
+#     variant/clade rows go to every shard holding a row of their sample, rows of samples not in sample file go to shard 0
+#   process: each shard is aggregated into partial cubes in Stat-{dataset}/shards/{shard}, independently of other shards
+#   merge: partial cubes are summed up into cubes of the whole data set, stat views are made from them as usual
+#   shards may be processed on separate nodes sharing the data folder, merge checks they are all made from the same split
+
+shardFolderName = 'shards'
+# increment when format of split or partial cubes changes
+shardFormatVersion = 2
+partitionColumns = {'country': 'Geo_Country', 'continent': 'Geo_Region', 'date': 'Collection_Date'}
+
+def splitShards(version, dataset, shards, partitionBy, chunkSize):
+    inputFolder = os.path.join(os.getcwd(), "data", version, dataset)
+    shardFolder = os.path.join(inputFolder, shardFolderName)
+    getFilePath = lambda folder, name: os.path.join(folder, name + '_' + version + '_' + dataset + '.tsv')
+    shardFolders = [os.path.join(shardFolder, str(shard)) for shard in range(shards)]
+    for folder in shardFolders:
+        os.makedirs(folder, exist_ok=True)
+
+    # date ranges are split at dates of every (samples / shards)-th sample
+    partitionColumn = partitionColumns[partitionBy]
+    sampleFilePath = getFilePath(inputFolder, 'samples')
+    boundaries = None
+    if partitionBy == 'date':
+        dates = pd.read_csv(sampleFilePath, delimiter='\t', usecols=[partitionColumn], dtype=str, na_filter=False)[partitionColumn].values
+        dates = np.sort(dates.astype(str))
+        boundaries = dates[[len(dates) * shard // shards for shard in range(1, shards)]] if len(dates) else np.array([], dtype=str)
+
+    # shards of each sample, rows of a sample are found in several shards when its rows in sample file are partitioned apart
+    sampleChunks = []
+    def assignSampleShards(keys):
+        shardNumbers = getPartitionShards(keys[1], shards, boundaries)
+        sampleChunks.append(pd.DataFrame({'Sample': keys[0], 'shard': shardNumbers}))
+        return np.arange(len(shardNumbers)), shardNumbers
+    splitShardFile(sampleFilePath, [getFilePath(folder, 'samples') for folder in shardFolders], ['Sample', partitionColumn], assignSampleShards, chunkSize)
+    sampleShards = pd.concat(sampleChunks, ignore_index=True) if sampleChunks else pd.DataFrame({'Sample': [], 'shard': np.array([], dtype=np.int64)})
+    sampleShards = sampleShards.drop_duplicates()
+    del sampleChunks
+    duplicated = sampleShards['Sample'].duplicated().values
+    firstShards = pd.Series(sampleShards['shard'].values[~duplicated], index=sampleShards['Sample'].values[~duplicated])
+    duplicateSamples = firstShards.index.get_indexer(sampleShards['Sample'].values[duplicated])
+    order = np.argsort(duplicateSamples, kind='stable')
+    duplicateShards = (duplicateSamples[order], sampleShards['shard'].values[duplicated][order])
+
+    # variant/clade rows are copied into every shard of their sample, so that each shard counts them for its own sample rows
+    def assignRowShards(keys):
+        positions = firstShards.index.get_indexer(keys[0])
+        duplicateRows, shardNumbers = expandDuplicateValues(positions, *duplicateShards)
+        rows = np.concatenate([np.arange(len(positions)), duplicateRows])
+        return rows, np.concatenate([np.where(positions >= 0, firstShards.values[positions], 0), shardNumbers])
+    for name in cubeInputs:
+        splitShardFile(getFilePath(inputFolder, name), [getFilePath(folder, name) for folder in shardFolders], ['Sample'], assignRowShards, chunkSize)
+
+    # partial cubes of shards are merged only when they are made from this split
+    split = {'format': shardFormatVersion, 'shards': shards, 'partitionBy': partitionBy, 'created': datetime.datetime.now().isoformat(),
+             'samples': [int(count) for count in np.bincount(sampleShards['shard'].values.astype(np.int64), minlength=shards)]}
+    with open(os.path.join(shardFolder, 'shards.json'), 'w') as f:
+        json.dump(split, f, indent=1)
+    print("Split into " + str(shards) + " shards by " + partitionBy + ": " + ', '.join(str(count) for count in split['samples']) + " samples")
+
+    return split
+
+# shard of each key, names are hashed so that the same name goes to the same shard on any node
+def getPartitionShards(keys, shards, boundaries=None):
+    if boundaries is not None:
+        return np.searchsorted(boundaries, keys.astype(str), side='right')
+    codes, names = pd.factorize(keys)
+    nameShards = np.array([zlib.crc32(name.encode('utf-8')) % shards for name in names], dtype=np.int64)
+
+    return nameShards[codes]
+
+# copy lines of file into shard files without parsing them, so that shard files are read the same as the original
+#   columns = columns given to assignShards, which returns (line numbers, shard of each) from their values, a line may go to several shards
+def splitShardFile(filePath, shardFilePaths, columns, assignShards, chunkSize):
+    with open(filePath, encoding='utf-8', newline='') as f:
+        header = f.readline()
+        names = header.rstrip('\r\n').split('\t')
+        aliases = {column: alias for alias, column in columnAliases.items()}
+        positions = [names.index(column) if column in names else names.index(aliases.get(column)) for column in columns]
+
+        shardFiles = [open(shardFilePath, 'w', encoding='utf-8', newline='') for shardFilePath in shardFilePaths]
+        try:
+            for shardFile in shardFiles:
+                shardFile.write(header)
+            while True:
+                chunk = list(itertools.islice(f, chunkSize))
+                if len(chunk) == 0:
+                    break
+                # blank lines are skipped by read_csv, so they are dropped
+                lines = np.array([line if line.endswith('\n') else line + '\n' for line in chunk if line.strip('\r\n')], dtype=object)
+                if len(lines) == 0:
+                    continue
+                # only fields up to key columns are split, in one pass over lines
+                splitCount = max(positions) + 1
+                fields = [line.rstrip('\r\n').split('\t', splitCount) for line in lines]
+                lineNumbers, shardNumbers = assignShards([np.array([field[position] if position < len(field) else '' for field in fields], dtype=object)
+                                                          for position in positions])
+                lines = lines[lineNumbers]
+
+                # lines keep their order in each shard
+                order = np.lexsort((lineNumbers, shardNumbers))
+                bounds = np.searchsorted(shardNumbers[order], np.arange(len(shardFiles) + 1))
+                for shard, shardFile in enumerate(shardFiles):
+                    shardFile.write(''.join(lines[order[bounds[shard]:bounds[shard + 1]]]))
+        finally:
+            for shardFile in shardFiles:
+                shardFile.close()
+
+def readShardSplit(version, dataset):
+    splitFilePath = os.path.join(os.getcwd(), "data", version, dataset, shardFolderName, 'shards.json')
     try:
-        print("---------- Processing: No.19 Stat view ---------- ")
-
-        index = 'Geo_City'
-        period = 'YearMonth'
-        countryCountByMonth = createDateColumns(sampleData[period].min(),sampleData[period].max(), period )
-        tempCountryCountByMonth = pd.pivot_table(sampleData, values = 'count', index=index , columns=period, aggfunc='count', fill_value=0 )
-        countryCountByMonth = pd.concat([countryCountByMonth, tempCountryCountByMonth], sort=True)
-        countryCountByMonth = countryCountByMonth.fillna('0') 
-        countryCountByMonth.insert(0, index, countryCountByMonth.index)
-        fileName = '02_city_samples_collection_month_'+version+'_'+dataset+'.csv'
-        countryCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
-
-        print("---------- Done: No.19 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.19 Stat view ")
+        with open(splitFilePath) as f:
+            split = json.load(f)
+    except (IOError, ValueError):
+        raise ValueError('No split in ' + splitFilePath + ', split input files with --shards N first')
+    if split.get('format') != shardFormatVersion:
+        raise ValueError('Shards in ' + splitFilePath + ' were split in another format, split input files again with --shards N')
+
+    return split
+
+# aggregate a shard into partial cubes, every cube is made so that any stat view can be made after merge
+def processShard(version, dataset, shard, chunkSize):
+    split = readShardSplit(version, dataset)
+    inputFolder = os.path.join(os.getcwd(), "data", version, dataset, shardFolderName, str(shard))
+    partialFolder = os.path.join(os.getcwd(), "data", version, "Stat-" + dataset, shardFolderName, str(shard))
+    getFilePath = lambda name: os.path.join(inputFolder, name + '_' + version + '_' + dataset + '.tsv')
+    if shard not in range(split['shards']):
+        raise ValueError('No shard ' + str(shard) + ', input files are split into ' + str(split['shards']) + ' shards')
+
+    # partial cubes left by a failed run must not be merged
+    shardFilePath = os.path.join(partialFolder, 'shard.json')
+    if os.path.exists(shardFilePath):
+        os.remove(shardFilePath)
+
+    sampleData = dateProcess(loadTable(getFilePath('samples'), sampleSchema))
+    cubes = {'sample': buildAggregationCube(sampleData)}
+    for name, (schema, index, attributes) in cubeInputs.items():
+        chunks = loadTableChunks(getFilePath(name), schema, chunkSize)
+        cubes[name] = buildStreamingAggregationCube(chunks, sampleData, index, attributes)
+    saveRunState(partialFolder, sampleData, cubes)
+
+    with open(shardFilePath, 'w') as f:
+        json.dump({'format': shardFormatVersion, 'created': split['created'], 'shard': shard,
+                   'latestCollectionDate': getLatestCollectionDate(sampleData)}, f)
+
+# process shards on local worker processes, returns shards which failed
+#   one process is used for each shard, so that memory of a shard is released before the next one
+def processShards(version, dataset, shardIds, workers, chunkSize):
+    arguments = [(version, dataset, shard, chunkSize) for shard in shardIds]
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context('fork').Pool(min(workers, len(shardIds)), maxtasksperchild=1)
+        try:
+            results = pool.starmap(runShardProcess, arguments, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [runShardProcess(*shardArguments) for shardArguments in arguments]
+
+    return [shard for shard, succeeded in zip(shardIds, results) if not succeeded]
+
+def runShardProcess(version, dataset, shard, chunkSize):
+    print("---------- Processing: shard " + str(shard) + " ---------- ")
+    try:
+        processShard(version, dataset, shard, chunkSize)
+    except Exception:
         traceback.print_exc()
+        print("---------- Failed: shard " + str(shard) + " ---------- ")
+        return False
+    print("---------- Done: shard " + str(shard) + " ---------- ")
 
-    # No.5 Stat view data:   Variant count of each continent by month
+    return True
+
+# split and process shards of a data set as given by --shards, --shard-step and --shard-ids, returns False on error
+def runShardSteps(version, dataset, args):
     try:
-        print("---------- Processing: No.5 Stat view ---------- ")
+        if args.shard_step in (None, 'split'):
+            if any(fileCheck(os.path.join(os.getcwd(), "data", version, dataset, name + "_" + version + "_" + dataset + ".tsv")) == 0
+                   for name in ['samples'] + list(cubeInputs)):
+                return False
+            splitShards(version, dataset, args.shards, args.partition_by, args.chunk_size)
+        if args.shard_step in (None, 'process'):
+            shards = readShardSplit(version, dataset)['shards']
+            shardIds = [int(shard) for shard in args.shard_ids.split(',')] if args.shard_ids else list(range(shards))
+            failedShards = processShards(version, dataset, shardIds, args.workers, args.chunk_size)
+            if failedShards:
+                print("Error: failed shards " + ', '.join(str(shard) for shard in failedShards))
+                return False
+    except ValueError as e:
+        print("Error: " + str(e))
+        return False
+
+    return True
+
+# sum up partial cubes of all shards, returns (cubes, latest collection date)
+#   names = cubes to merge ('sample', 'variant', 'clade')
+def mergeShardCubes(version, dataset, names):
+    split = readShardSplit(version, dataset)
+    partialRoot = os.path.join(os.getcwd(), "data", version, "Stat-" + dataset, shardFolderName)
+    partialCubes = {name: [] for name in names}
+    latestCollectionDates = []
+    for shard in range(split['shards']):
+        partialFolder = os.path.join(partialRoot, str(shard))
+        try:
+            with open(os.path.join(partialFolder, 'shard.json')) as f:
+                shardInfo = json.load(f)
+        except (IOError, ValueError):
+            raise ValueError('Shard ' + str(shard) + ' is not processed, run it with --shard-step process --shard-ids ' + str(shard))
+        if shardInfo.get('format') != shardFormatVersion or shardInfo.get('created') != split['created']:
+            raise ValueError('Shard ' + str(shard) + ' was processed from another split, run it again with --shard-step process --shard-ids ' + str(shard))
+
+        for name in names:
+            partialCubes[name].append(loadStateCube(partialFolder, name))
+        if shardInfo['latestCollectionDate'] is not None:
+            latestCollectionDates.append(shardInfo['latestCollectionDate'])
+
+    # partial cubes of all shards are summed up at once, each key is grouped only once
+    cubes = {name: mergeAggregationCubes(partialCubes.pop(name)) for name in names}
+
+    return cubes, max(latestCollectionDates) if latestCollectionDates else None
 
-        selectRange = 'Geo_Region'
-        index = 'Mutation'
-        period = 'YearMonth'
-        mergedVariantCountByMonth = processTargetCountByPeriod(mergedVariantData, selectRange, index, period)
-        fileName = '03_continent_variants_month_'+version+'_'+dataset+'.csv'
-        mergedVariantCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
+#----------------------------------------------------------------------------------------------------------
 
-        print("---------- Done: No.5 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.5 Stat view ")
-        traceback.print_exc()
+# get count of each item by summing up the aggregation cube
+#   cube = sampleCube, variantCube, cladeCube
+#   selectRange = {'Geo_Region', 'Geo_Country', 'Geo_City', 'Gene', 'Protein'}
+#   index = {None, 'Mutation', 'Detail'}
+#   period = {None, 'YearMonth','YearMonthDay', 'Week'}
 
+def rollupCube(cube, selectRange, index=None, period=None):
+    keys = [selectRange] + ([index] if index else []) + ([period] if period else [])
+    if period:
+        # rows without collection date do not belong to any period
+        cube = cube[cube[period] != missingPeriodCode]
 
-    # No.6 Stat view data:   Variant count of each country by month
-    try:
-        print("---------- Processing: No.6 Stat view ---------- ")
+    return cube.groupby(keys, sort=True)['count'].sum()
 
-        selectRange = 'Geo_Country'
-        index = 'Mutation'
-        period = 'YearMonth'
-        mergedVariantCountByMonth = processTargetCountByPeriod(mergedVariantData, selectRange, index, period)
-        fileName = '03_country_variants_month_'+version+'_'+dataset+'.csv'
-        mergedVariantCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
+#----------------------------------------------------------------------------------------------------------
 
-        print("---------- Done: No.6 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.6 Stat view ")
-        traceback.print_exc()
+# get time series count table for each country/continent from the aggregation cube
+#   same output as processTargetCountByPeriod, index = None for sample count
 
-    # No.23 Stat view data:   Variant count of each city by month
-    try:
-        print("---------- Processing: No.23 Stat view ---------- ")
+def processCubeCountByPeriod(cube, selectRange, index, period):
+    countResult = rollupCube(cube, selectRange, index, period)
+    start, end = getCubePeriodRange(cube, period)
 
-        selectRange = 'Geo_City'
-        index = 'Mutation'
-        period = 'YearMonth'
-        mergedVariantCountByMonth = processTargetCountByPeriod(mergedVariantData, selectRange, index, period)
-        fileName = '03_city_variants_month_'+version+'_'+dataset+'.csv'
-        mergedVariantCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
+    return createCountTable(countResult, period, start, end)
 
-        print("---------- Done: No.23 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.23 Stat view ")
-        traceback.print_exc()
+# same as processCubeCountByPeriod, but only non-zero counts in long format with period axis
+def processCubeSparseCountByPeriod(cube, selectRange, index, period):
+    countResult = rollupCube(cube, selectRange, index, period)
+    start, end = getCubePeriodRange(cube, period)
 
-    # No.7 Stat view data:   Clade count of each continent by month
-    try:    
-        print("---------- Processing: No.7 Stat view ---------- ")
+    return createSparseCountTable(countResult, period, start, end)
 
-        selectRange = 'Geo_Region'
-        index = 'Detail'
-        period = 'YearMonth'
-        mergedCladeCountByMonth = processTargetCountByPeriod(mergedCladeData, selectRange, index, period)
-        fileName = '04_continent_clade_month_'+version+'_'+dataset+'.csv'
-        mergedCladeCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
+def getCubePeriodRange(cube, period):
+    periodList = cube.loc[cube[period] != missingPeriodCode, period]
 
-        print("---------- Done: No.7 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.7 Stat view ")
-        traceback.print_exc()
+    return periodList.min(), periodList.max()
 
-    # No.8 Stat view data:   Clade count of each country by month
-    try: 
-        print("---------- Processing: No.8 Stat view ---------- ")
+#----------------------------------------------------------------------------------------------------------
 
-        selectRange = 'Geo_Country'
-        index = 'Detail'
-        period = 'YearMonth'
-        mergedCladeCountByMonth = processTargetCountByPeriod(mergedCladeData, selectRange, index, period)
-        fileName = '04_country_clade_month_'+version+'_'+dataset+'.csv'
-        mergedCladeCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
+# daily index, cumulative daily counts of each (country/continent, item) series to count any date range without scanning data
+#   only days with counts are kept, rows of all series are sorted by (series, day) like compressed sparse rows
+#   series = (selectRange, [index]) of each series, offsets = first row of each series (and total rows at the end)
+#   days = day code (YearMonthDay) of each row, cumulative = counts summed up to each row, with 0 before the first row
+#   keys = series number * span + day offset of each row, increasing over all rows so that rows can be found by binary search
+#   count of series i in days [first, last] = cumulative[row after last] - cumulative[row of first]
+
+DailyIndex = collections.namedtuple('DailyIndex', ['series', 'offsets', 'days', 'cumulative', 'firstDay', 'span', 'keys'])
+
+dailyIndexFolderName = 'daily_index'
+# increment when format of saved daily index changes
+dailyIndexFormatVersion = 1
+
+def buildDailyIndex(cube, selectRange, index=None):
+    countResult = rollupCube(cube, selectRange, index, 'YearMonthDay')
+    days = countResult.index.get_level_values('YearMonthDay').values.astype(np.int32)
+
+    # rollup is sorted by series, so a series starts where any of its keys changes
+    seriesCodes = [np.asarray(codes) for codes in countResult.index.codes[:-1]]
+    seriesStarts = np.zeros(len(days), dtype=bool)
+    seriesStarts[:1] = True
+    for codes in seriesCodes:
+        seriesStarts[1:] |= codes[1:] != codes[:-1]
+    offsets = np.append(np.flatnonzero(seriesStarts), len(days)).astype(np.int64)
+    series = countResult.index.droplevel('YearMonthDay')[offsets[:-1]].to_frame(index=False)
+    cumulative = np.append(0, np.cumsum(countResult.values, dtype=np.int64))
+
+    return createDailyIndex(series, offsets, days, cumulative)
+
+def createDailyIndex(series, offsets, days, cumulative):
+    firstDay = int(days.min()) if len(days) else 0
+    # span is longer than days of any series, so that keys of a series never reach the next series
+    span = (int(days.max()) - firstDay + 2) if len(days) else 1
+    seriesNumbers = np.repeat(np.arange(len(series), dtype=np.int64), np.diff(offsets))
+    keys = seriesNumbers * span + (days - firstDay)
+
+    return DailyIndex(series, offsets, days, cumulative, firstDay, span, keys)
+
+# counts of each series in days [firstDay, lastDay], days are codes of YearMonthDay (see getDayCode)
+def queryDailyIndex(dailyIndex, firstDay, lastDay):
+    counts = countDailyIndexRanges(dailyIndex, np.array([firstDay, lastDay + 1]))[:, 0]
+
+    return pd.Series(counts, index=pd.MultiIndex.from_frame(dailyIndex.series) if dailyIndex.series.shape[1] > 1
+                     else pd.Index(dailyIndex.series.iloc[:, 0]), name='count')
+
+# counts of each series between consecutive bounds, bounds = first day of each range and day after the last range
+#   seriesNumbers = rows of dailyIndex.series to count (default: all series)
+def countDailyIndexRanges(dailyIndex, bounds, seriesNumbers=None):
+    if seriesNumbers is None:
+        seriesNumbers = np.arange(len(dailyIndex.series), dtype=np.int64)
+    boundOffsets = np.clip(np.asarray(bounds, dtype=np.int64) - dailyIndex.firstDay, 0, dailyIndex.span - 1)
+    boundKeys = np.asarray(seriesNumbers, dtype=np.int64)[:, None] * dailyIndex.span + boundOffsets[None, :]
+    rows = np.searchsorted(dailyIndex.keys, boundKeys)
+
+    return np.diff(dailyIndex.cumulative[rows], axis=1)
+
+def getDayCode(date):
+    return int(np.datetime64(date, 'D').astype(np.int64))
+
+# time series count table derived from daily index, same as processCubeCountByPeriod of the cube it was built from
+def processDailyIndexCountByPeriod(dailyIndex, period):
+    start, end = getDailyIndexPeriodRange(dailyIndex, period)
+    dateColumns = createDateColumns(start, end, period)
+    bounds = getPeriodFirstDays(np.append(dateColumns, dateColumns[-1] + 1), period)
+    countTable = pd.DataFrame(countDailyIndexRanges(dailyIndex, bounds), columns=formatPeriodLabels(dateColumns, period))
+
+    return pd.concat([dailyIndex.series, countTable], axis=1)
+
+def getDailyIndexPeriodRange(dailyIndex, period):
+    firstDay, lastDay = dailyIndex.firstDay, dailyIndex.firstDay + dailyIndex.span - 2
+
+    return getDayPeriodCodes([firstDay, lastDay], period)
+
+# period code of each day code, same as dateProcess
+def getDayPeriodCodes(days, period):
+    days = np.asarray(days, dtype=np.int64)
+    if (period == 'YearMonth'):
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    if (period == 'Week'):
+        return (days + 3) // 7
 
-        print("---------- Done: No.8 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.8 Stat view ")
-        traceback.print_exc()
+    return days
 
-    # No.22 Stat view data:   Clade count of each city by month
-    try: 
-        print("---------- Processing: No.22 Stat view ---------- ")
+# first day code of each period code
+def getPeriodFirstDays(codes, period):
+    codes = np.asarray(codes, dtype=np.int64)
+    if (period == 'YearMonth'):
+        return codes.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    if (period == 'Week'):
+        # week starts on Monday, 3 days before its code boundary (see dateProcess)
+        return codes * 7 - 3
+
+    return codes
+
+# daily index is stored as one NumPy file per array, which is memory-mapped on load
+def saveDailyIndex(indexFolder, dailyIndex):
+    os.makedirs(indexFolder, exist_ok=True)
+    dailyIndex.series.to_csv(os.path.join(indexFolder, 'series.tsv.gz'), sep='\t', index=False)
+    for name in ['offsets', 'days', 'cumulative']:
+        np.save(os.path.join(indexFolder, name + '.npy'), getattr(dailyIndex, name))
+    with open(os.path.join(indexFolder, 'index.json'), 'w') as f:
+        json.dump({'format': dailyIndexFormatVersion}, f)
+
+def loadDailyIndex(indexFolder):
+    with open(os.path.join(indexFolder, 'index.json')) as f:
+        if json.load(f)['format'] != dailyIndexFormatVersion:
+            raise ValueError('Daily index in ' + indexFolder + ' was saved in another format, build it again with --daily-index')
+
+    # strings such as 'NA' are valid names, so they must not be read as NaN
+    series = pd.read_csv(os.path.join(indexFolder, 'series.tsv.gz'), sep='\t', dtype=str, keep_default_na=False)
+    offsets, days, cumulative = [np.load(os.path.join(indexFolder, name + '.npy'), mmap_mode='r') for name in ['offsets', 'days', 'cumulative']]
+
+    return createDailyIndex(series, offsets, days, cumulative)
+
+# daily indexes of time series count tables of selected stat views, one per (input, selectRange)
+#   each is saved in {indexFolder}/{input}_{selectRange} (ex. variant_Geo_Country)
+def buildDailyIndexes(cubes, views, indexFolder):
+    indexNames = []
+    for view in views:
+        if view.process not in sparseProcesses:
+            continue
+        indexName = view.input + '_' + view.selectRange
+        if indexName not in indexNames:
+            saveDailyIndex(os.path.join(indexFolder, indexName), buildDailyIndex(cubes[view.input], view.selectRange, view.index))
+            indexNames.append(indexName)
+
+    return indexNames
 
-        selectRange = 'Geo_City'
-        index = 'Detail'
-        period = 'YearMonth'
-        mergedCladeCountByMonth = processTargetCountByPeriod(mergedCladeData, selectRange, index, period)
-        fileName = '04_city_clade_month_'+version+'_'+dataset+'.csv'
-        mergedCladeCountByMonth.to_csv(outputFolder + os.path.sep + fileName, index=False)
+#----------------------------------------------------------------------------------------------------------
 
-        print("---------- Done: No.22 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.22 Stat view ")
-        traceback.print_exc()
+# process functions of stat views
+#   inputs = {'sample': sampleCube, 'variant': variantCube, 'clade': cladeCube, 'sampleData': sampleData, 'variantData': variantData,
+#             'catalog': mutationCatalog, 'latestCollectionDate': getLatestCollectionDate(sampleData)}
+#   view = StatView declared in statViews
+
+def getLatestCollectionDate(sampleData):
+    # categories of Collection_Date are the distinct raw date strings
+    categories = sampleData['Collection_Date'].cat.categories
+
+    return categories.max() if len(categories) else None
+
+def processBasicInfo(inputs, view):
+    basicInfo = pd.DataFrame([
+        ['Analyzed Date', datetime.datetime.now()],
+        ['Latest Collention Date', inputs['latestCollectionDate']],
+        ['Total Sample Number', inputs['sample']['count'].sum()],
+        ['Total Variant Number', len(inputs['variant']['Mutation'].unique())],
+    ])
+
+    return basicInfo
+
+def processRegionCount(inputs, view):
+    regionCount = rollupCube(inputs[view.input], view.selectRange)
+    regionCount = regionCount.to_frame('count')
+    regionCount.insert(0, view.selectRange, regionCount.index)
+
+    return regionCount
+
+def processCountByPeriod(inputs, view):
+    return processCubeCountByPeriod(inputs[view.input], view.selectRange, view.index, view.period)
+
+def processSparseCountByPeriod(inputs, view):
+    return processCubeSparseCountByPeriod(inputs[view.input], view.selectRange, view.index, view.period)
+
+# items found in samples with collection date, listed from mutation catalog
+def processItemList(inputs, view):
+    catalog = inputs[view.input]
+    return getCatalogItemList(catalog[catalog['firstSeen'] != missingPeriodCode], view.selectRange, view.index)
+
+def processSubGeneItemList(inputs, view):
+    selectGene = 'ORF1ab'
+    catalog = inputs[view.input]
+    selectGeneCatalog = catalog[(catalog['Gene'] == selectGene) & (catalog['firstSeen'] != missingPeriodCode)]
+
+    return getCatalogItemList(selectGeneCatalog, view.selectRange, view.index)
+
+def getCatalogItemList(catalog, selectRange, index):
+    itemList = catalog[[selectRange, index]].drop_duplicates()
+
+    return itemList.sort_values([selectRange, index]).reset_index(drop=True)
+
+# prevalence (count / samples of the region in the period) and growth of prevalence from the previous period
+# of the most frequent items of each region, in long format with non-zero counts only
+#   growth is empty when the item was not found in the previous period
+def processPrevalenceByPeriod(inputs, view):
+    countResult = rollupCube(inputs[view.input], view.selectRange, view.index, view.period)
+    sampleCount = rollupCube(inputs['sample'], view.selectRange, None, view.period)
+    countResult = countResult[selectTopItems(countResult, sampleCount.groupby(level=0).sum(), view.selectRange)]
+
+    table = countResult.to_frame('count').reset_index()
+    table = table.merge(sampleCount.to_frame('samples').reset_index(), how='left', on=[view.selectRange, view.period])
+    table['prevalence'] = table['count'] / table['samples']
+    previousTable = table[[view.selectRange, view.index, view.period, 'prevalence']].copy()
+    previousTable[view.period] += 1
+    table = table.merge(previousTable, how='left', on=[view.selectRange, view.index, view.period], suffixes=('', '_previous'))
+    table['growth'] = table['prevalence'] / table['prevalence_previous'] - 1
+    table[view.period] = formatPeriodLabels(table[view.period].values, view.period)
+
+    return table[[view.selectRange, view.index, view.period, 'count', 'samples', 'prevalence', 'growth']].round({'prevalence': 6, 'growth': 6})
+
+# mutation pairs found together in samples, from variant data and sample lookup table instead of merged data
+def processCooccurrenceByPeriod(inputs, view):
+    variantData = inputs[view.input]
+    sampleLookup = buildSampleLookup(inputs['sampleData'])
+    cells = sampleLookup[2]
+    # rows of samples found in several rows of sample data are added again with their other cells, like merged data
+    duplicateRows, duplicateCells = lookupDuplicateCells(variantData['Sample'], sampleLookup)
+    rows = np.concatenate([np.arange(len(variantData)), duplicateRows])
+    cellRows = np.concatenate([lookupSampleCells(variantData['Sample'], sampleLookup), duplicateCells])
+    data = pd.DataFrame({
+        'Sample': variantData['Sample'].values[rows],
+        view.selectRange: cells[view.selectRange].values[cellRows],
+        view.period: cells[view.period].values[cellRows],
+        view.index: variantData[view.index].values[rows],
+    })
+
+    return processTargetCooccurrenceByPeriod(data, view.selectRange, view.index, view.period, cooccurrenceCutoff['minSupport'])
+
+# cutoff of co-occurrence tables, set by --min-support
+#   minSupport = pairs found in less samples of the region in the period are dropped
+cooccurrenceCutoff = {'minSupport': 10}
+
+# cutoff of items in prevalence tables of each region, set by --top-n and --min-prevalence
+#   topN = most frequent items kept in each region (0 for all)
+#   minPrevalence = items whose total count / samples of the region is less than this are dropped
+prevalenceCutoff = {'topN': 100, 'minPrevalence': 0.0}
+
+# select (region, item) of countResult passing prevalenceCutoff, items are ranked by total count in the region
+#   regionSamples = total samples of each region
+def selectTopItems(countResult, regionSamples, selectRange):
+    totalCount = countResult.groupby(level=[0, 1]).sum()
+    selected = pd.Series(True, index=totalCount.index)
+    if prevalenceCutoff['topN'] > 0:
+        # ties are ranked in order of item
+        selected &= totalCount.groupby(level=0).rank(method='first', ascending=False) <= prevalenceCutoff['topN']
+    if prevalenceCutoff['minPrevalence'] > 0:
+        prevalence = totalCount / regionSamples.reindex(totalCount.index.get_level_values(0)).values
+        selected &= prevalence >= prevalenceCutoff['minPrevalence']
+
+    return selected.reindex(countResult.index.droplevel(2)).values
 
-    # No.9 Stat view data:   Count of each continent by week
-    try: 
-        print("---------- Processing: No.9 Stat view ---------- ")
-
-        index = 'Geo_Region'
-        period = 'Week'
-        continentCountByWeek = createDateColumns(sampleData[period].min(),sampleData[period].max(), period )
-        tempContinentCountByWeek = pd.pivot_table(sampleData, values = 'count', index =index , columns =period, aggfunc ='count', fill_value=0 )
-        continentCountByWeek = pd.concat([continentCountByWeek, tempContinentCountByWeek], sort=True)
-        continentCountByWeek = continentCountByWeek.fillna('0') 
-        continentCountByWeek.insert(0, index, continentCountByWeek.index)
-        fileName = '05_continent_samples_collection_week_'+version+'_'+dataset+'.csv'
-        continentCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
-
-        print("---------- Done: No.9 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.9 Stat view ")
-        traceback.print_exc()
+#----------------------------------------------------------------------------------------------------------
 
-    # No.10 Stat view data:   Count of each country by week
-    try: 
-        print("---------- Processing: No.10 Stat view ---------- ")
-
-        index = 'Geo_Country'
-        period = 'Week'
-        countryCountByWeek = createDateColumns(sampleData[period].min(),sampleData[period].max(), period )
-        tempCountryCountByWeek = pd.pivot_table(sampleData, values = 'count', index =index , columns =period, aggfunc ='count', fill_value=0 )
-        countryCountByWeek = pd.concat([countryCountByWeek, tempCountryCountByWeek], sort=True)
-        countryCountByWeek = countryCountByWeek.fillna('0') 
-        countryCountByWeek.insert(0, index, countryCountByWeek.index)
-        fileName = '05_country_samples_collection_week_'+version+'_'+dataset+'.csv'
-        countryCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
-
-        print("---------- Done: No.10 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.10 Stat view ")
-        traceback.print_exc()
+# stat views in processing order
+#   number = No. of stat view
+#   fileName = output file is {fileName}_{version}_{dataset}.csv
+#   input = key of inputs given to process function, 'variantData' is variant data loaded without aggregation
+
+StatView = collections.namedtuple('StatView', ['number', 'fileName', 'process', 'input', 'selectRange', 'index', 'period'])
+
+# process functions which can write sparse output instead
+sparseProcesses = {processCountByPeriod: processSparseCountByPeriod}
+
+statViews = [
+    StatView(0, '00_basic_infomaction', processBasicInfo, None, None, None, None),
+    StatView(16, '00_gene_variant', processItemList, 'catalog', 'Gene', 'Mutation', None),
+    StatView(17, '00_ORF1ab_sub_variant', processSubGeneItemList, 'catalog', 'Protein', 'Mutation', None),
+    StatView(1, '01_continent_samples', processRegionCount, 'sample', 'Geo_Region', None, None),
+    StatView(2, '01_country_samples', processRegionCount, 'sample', 'Geo_Country', None, None),
+    StatView(18, '01_city_samples', processRegionCount, 'sample', 'Geo_City', None, None),
+    StatView(3, '02_continent_samples_collection_month', processCountByPeriod, 'sample', 'Geo_Region', None, 'YearMonth'),
+    StatView(4, '02_country_samples_collection_month', processCountByPeriod, 'sample', 'Geo_Country', None, 'YearMonth'),
+    StatView(19, '02_city_samples_collection_month', processCountByPeriod, 'sample', 'Geo_City', None, 'YearMonth'),
+    StatView(5, '03_continent_variants_month', processCountByPeriod, 'variant', 'Geo_Region', 'Mutation', 'YearMonth'),
+    StatView(6, '03_country_variants_month', processCountByPeriod, 'variant', 'Geo_Country', 'Mutation', 'YearMonth'),
+    StatView(23, '03_city_variants_month', processCountByPeriod, 'variant', 'Geo_City', 'Mutation', 'YearMonth'),
+    StatView(7, '04_continent_clade_month', processCountByPeriod, 'clade', 'Geo_Region', 'Detail', 'YearMonth'),
+    StatView(8, '04_country_clade_month', processCountByPeriod, 'clade', 'Geo_Country', 'Detail', 'YearMonth'),
+    StatView(22, '04_city_clade_month', processCountByPeriod, 'clade', 'Geo_City', 'Detail', 'YearMonth'),
+    StatView(9, '05_continent_samples_collection_week', processCountByPeriod, 'sample', 'Geo_Region', None, 'Week'),
+    StatView(10, '05_country_samples_collection_week', processCountByPeriod, 'sample', 'Geo_Country', None, 'Week'),
+    StatView(20, '05_city_samples_collection_week', processCountByPeriod, 'sample', 'Geo_City', None, 'Week'),
+    StatView(11, '06_continent_variants_week', processCountByPeriod, 'variant', 'Geo_Region', 'Mutation', 'Week'),
+    StatView(12, '06_country_variants_week', processCountByPeriod, 'variant', 'Geo_Country', 'Mutation', 'Week'),
+    StatView(21, '06_city_variants_week', processCountByPeriod, 'variant', 'Geo_City', 'Mutation', 'Week'),
+    StatView(13, '07_continent_clade_week', processCountByPeriod, 'clade', 'Geo_Region', 'Detail', 'Week'),
+    StatView(14, '07_country_clade_week', processCountByPeriod, 'clade', 'Geo_Country', 'Detail', 'Week'),
+    StatView(15, '07_city_clade_week', processCountByPeriod, 'clade', 'Geo_City', 'Detail', 'Week'),
+    StatView(24, '08_continent_variants_prevalence_month', processPrevalenceByPeriod, 'variant', 'Geo_Region', 'Mutation', 'YearMonth'),
+    StatView(25, '08_country_variants_prevalence_month', processPrevalenceByPeriod, 'variant', 'Geo_Country', 'Mutation', 'YearMonth'),
+    StatView(26, '09_continent_variants_prevalence_week', processPrevalenceByPeriod, 'variant', 'Geo_Region', 'Mutation', 'Week'),
+    StatView(27, '09_country_variants_prevalence_week', processPrevalenceByPeriod, 'variant', 'Geo_Country', 'Mutation', 'Week'),
+    StatView(28, '10_continent_variant_pairs_month', processCooccurrenceByPeriod, 'variantData', 'Geo_Region', 'Mutation', 'YearMonth'),
+    StatView(29, '10_country_variant_pairs_month', processCooccurrenceByPeriod, 'variantData', 'Geo_Country', 'Mutation', 'YearMonth'),
+]
+
+# key of each stat view in stat store payload, same as load() of tools/processors/stat.js
+#   only views loaded by load() (not commented out there) are written into the payload, see getStatStoreFileNames
+statStoreKeys = collections.OrderedDict([
+    ('00_basic_infomaction', 'basicInformation'),
+    ('00_gene_variant', 'geneVariant'),
+    ('00_ORF1ab_sub_variant', 'ORF1abSubVariant'),
+    ('01_continent_samples', 'continentSamples'),
+    ('01_country_samples', 'countrySamples'),
+    ('02_continent_samples_collection_month', 'continentSamplesCollectionMonth'),
+    ('02_country_samples_collection_month', 'countrySamplesCollectionMonth'),
+    ('03_continent_variants_month', 'continentVariantsMonth'),
+    ('03_country_variants_month', 'countryVariantsMonth'),
+    ('04_continent_clade_month', 'continentCladeMonth'),
+    ('04_country_clade_month', 'countryCladeMonth'),
+    ('05_continent_samples_collection_week', 'continentSamplesCollectionWeek'),
+    ('05_country_samples_collection_week', 'countrySamplesCollectionWeek'),
+    ('06_continent_variants_week', 'continentVariantsWeek'),
+    ('06_country_variants_week', 'countryVariantsWeek'),
+    ('07_continent_clade_week', 'continentCladeWeek'),
+    ('07_country_clade_week', 'countryCladeWeek'),
+])
 
-    # No.20 Stat view data:   Count of each city by week
-    try: 
-        print("---------- Processing: No.20 Stat view ---------- ")
-
-        index = 'Geo_City'
-        period = 'Week'
-        countryCountByWeek = createDateColumns(sampleData[period].min(),sampleData[period].max(), period )
-        tempCountryCountByWeek = pd.pivot_table(sampleData, values = 'count', index =index , columns =period, aggfunc ='count', fill_value=0 )
-        countryCountByWeek = pd.concat([countryCountByWeek, tempCountryCountByWeek], sort=True)
-        countryCountByWeek = countryCountByWeek.fillna('0') 
-        countryCountByWeek.insert(0, index, countryCountByWeek.index)
-        fileName = '05_city_samples_collection_week_'+version+'_'+dataset+'.csv'
-        countryCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
-
-        print("---------- Done: No.20 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.20 Stat view ")
-        traceback.print_exc()
+#----------------------------------------------------------------------------------------------------------
 
-    # No.11 Stat view data:   Variant count of each continent by week
-    try: 
-        print("---------- Processing: No.11 Stat view ---------- ")
+# select stat views by No., file name prefix or glob pattern, keeping processing order
+def selectStatViews(views, patterns):
+    selected = []
+    for pattern in patterns:
+        matched = [view for view in views if matchStatView(view, pattern)]
+        if len(matched) == 0:
+            raise ValueError('No stat view matches ' + pattern)
+        selected += matched
 
-        selectRange = 'Geo_Region'
-        index = 'Mutation'
-        period = 'Week'
-        mergedVariantCountByWeek = processTargetCountByPeriod(mergedVariantData, selectRange, index, period)
-        fileName = '06_continent_variants_week_'+version+'_'+dataset+'.csv'
-        mergedVariantCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
+    return [view for view in views if view in selected]
 
-        print("---------- Done: No.11 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.11 Stat view ")
-        traceback.print_exc()
+def matchStatView(view, pattern):
+    if pattern.isdigit():
+        return int(pattern) == view.number
 
-    # No.12 Stat view data:   Variant count of each country by week
-    try:  
-        print("---------- Processing: No.12 Stat view ---------- ")
+    return view.fileName.startswith(pattern) or fnmatch.fnmatchcase(view.fileName, pattern)
 
-        selectRange = 'Geo_Country'
-        index = 'Mutation'
-        period = 'Week'
-        mergedVariantCountByWeek = processTargetCountByPeriod(mergedVariantData, selectRange, index, period)
-        fileName = '06_country_variants_week_'+version+'_'+dataset+'.csv'
-        mergedVariantCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
+statJsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processors', 'stat.js')
 
-        print("---------- Done: No.12 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.12 Stat view ")
-        traceback.print_exc()
+# get file names of stat views loaded by stat.js (lines commented out are skipped)
+def getStatJsFileNames(statJsPath):
+    fileNamePattern = re.compile(r'^\s*const \w+ = await readFile\(`[^`]*/Stat-\$\{dataSet\}/(\w+?)_\$\{versionSet\}\.csv`\)')
+    fileNames = []
+    with open(statJsPath) as f:
+        for line in f:
+            matched = fileNamePattern.match(line)
+            if matched:
+                fileNames.append(matched.group(1))
 
-    # No.21 Stat view data:   Variant count of each city by week
-    try:  
-        print("---------- Processing: No.21 Stat view ---------- ")
+    return fileNames
 
-        selectRange = 'Geo_City'
-        index = 'Mutation'
-        period = 'Week'
-        mergedVariantCountByWeek = processTargetCountByPeriod(mergedVariantData, selectRange, index, period)
-        fileName = '06_city_variants_week_'+version+'_'+dataset+'.csv'
-        mergedVariantCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
+# file names of stat views written into stat store payload, the ones returned by load() of stat.js
+def getStatStoreFileNames():
+    return [fileName for fileName in getStatJsFileNames(statJsPath) if fileName in statStoreKeys]
 
-        print("---------- Done: No.21 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.21 Stat view ")
-        traceback.print_exc()
+# inputs used by process functions other than view.input ('sampleData' is always loaded, except in partitioned mode)
+processInputs = {processBasicInfo: ['sample', 'variant'], processPrevalenceByPeriod: ['sample', 'variant'],
+                 processCooccurrenceByPeriod: ['variantData'],
+                 processItemList: ['variant', 'catalog'], processSubGeneItemList: ['variant', 'catalog']}
 
-    # No.13 Stat view data:   Clade count of each continent by week
-    try: 
-        print("---------- Processing: No.13 Stat view ---------- ")
+def getRequiredInputs(views):
+    requiredInputs = set()
+    for view in views:
+        requiredInputs.update(processInputs.get(view.process, [view.input]))
 
-        selectRange = 'Geo_Region'
-        index = 'Detail'
-        period = 'Week'
-        mergedCladeCountByWeek = processTargetCountByPeriod(mergedCladeData, selectRange, index, period)
-        fileName = '07_continent_clade_week_'+version+'_'+dataset+'.csv'
-        mergedCladeCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
+    return requiredInputs
 
-        print("---------- Done: No.13 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.13 Stat view ")
-        traceback.print_exc()
+#----------------------------------------------------------------------------------------------------------
+
+# mutation catalog, one row per (Gene, Protein, Mutation) sorted in this order, built from variant cube
+#   firstSeen, lastSeen = first and last collection day (YearMonthDay), missingPeriodCode when found only in samples without date
+#   count = rows of variant data
+#   saved as one NumPy file per column, strings as fixed width UTF-8 bytes, so that it can be searched after memory-mapping it
+#   byMutation = order of rows sorted by Mutation, to find a mutation by binary search (see findCatalogMutations)
+
+catalogFolderName = 'mutation_catalog'
+# increment when format of saved mutation catalog changes
+catalogFormatVersion = 1
+catalogKeys = ['Gene', 'Protein', 'Mutation']
+
+def buildMutationCatalog(variantCube):
+    # missing day is the smallest code, so first day is taken from days with date only
+    days = variantCube['YearMonthDay'].where(variantCube['YearMonthDay'] != missingPeriodCode)
+    catalog = variantCube[catalogKeys].assign(firstSeen=days, lastSeen=days, count=variantCube['count'])
+    catalog = catalog.groupby(catalogKeys, sort=True).agg({'firstSeen': 'min', 'lastSeen': 'max', 'count': 'sum'}).reset_index()
+    catalog[['firstSeen', 'lastSeen']] = catalog[['firstSeen', 'lastSeen']].fillna(missingPeriodCode).astype(np.int32)
+    catalog['count'] = catalog['count'].astype(np.int64)
+
+    return catalog
+
+def saveMutationCatalog(catalogFolder, catalog):
+    os.makedirs(catalogFolder, exist_ok=True)
+    for column in catalogKeys:
+        np.save(os.path.join(catalogFolder, column + '.npy'), catalog[column].astype(str).str.encode('utf-8').values.astype(bytes))
+    for column in ['firstSeen', 'lastSeen', 'count']:
+        np.save(os.path.join(catalogFolder, column + '.npy'), catalog[column].values)
+    byMutation = np.argsort(catalog['Mutation'].astype(str).str.encode('utf-8').values.astype(bytes), kind='mergesort')
+    np.save(os.path.join(catalogFolder, 'byMutation.npy'), byMutation.astype(np.int64))
+    with open(os.path.join(catalogFolder, 'catalog.json'), 'w') as f:
+        json.dump({'format': catalogFormatVersion, 'rows': len(catalog)}, f)
+
+# load saved catalog as memory-mapped arrays {column: array}
+def loadMutationCatalog(catalogFolder):
+    with open(os.path.join(catalogFolder, 'catalog.json')) as f:
+        if json.load(f)['format'] != catalogFormatVersion:
+            raise ValueError('Mutation catalog in ' + catalogFolder + ' was saved in another format, run again to rebuild it')
+
+    columns = catalogKeys + ['firstSeen', 'lastSeen', 'count', 'byMutation']
+    return {column: np.load(os.path.join(catalogFolder, column + '.npy'), mmap_mode='r') for column in columns}
+
+# rows of saved catalog of each mutation, rows of a mutation found in several genes/proteins are all returned
+def findCatalogMutations(catalog, mutations):
+    keys = np.asarray([mutation.encode('utf-8') for mutation in mutations], dtype=bytes)
+    first = np.searchsorted(catalog['Mutation'], keys, side='left', sorter=catalog['byMutation'])
+    last = np.searchsorted(catalog['Mutation'], keys, side='right', sorter=catalog['byMutation'])
+    rows = np.concatenate([catalog['byMutation'][start:end] for start, end in zip(first, last)] + [np.zeros(0, dtype=np.int64)])
+
+    table = pd.DataFrame({column: catalog[column][rows] for column in catalogKeys + ['firstSeen', 'lastSeen', 'count']})
+    for column in catalogKeys:
+        table[column] = table[column].str.decode('utf-8')
+
+    return table
+
+#----------------------------------------------------------------------------------------------------------
+
+# CSV writer of output tables, which csv-parse of tools/processors/stat.js reads
+#   rows are formatted in blocks, integer counts are formatted by table lookup instead of value by value
+#   blocks of NumPy bool/number/object columns are written as DataFrame.to_csv(index=False) writes them,
+#   blocks having other columns (datetime, categorical, nullable integers, ...) are formatted by to_csv itself
+#   blocks are formatted and compressed by writerThreads threads (zlib and zstandard release GIL while compressing)
+#   file is always formatted and written into a temporary file, which replaces it only when its content differs from previous run
+#   options = {'compress': None, 'gzip' or 'zstd', 'writerThreads': N, 'previousHashes': {file name: {'sha1', 'size'}}}
+#   returns (file path, {'sha1', 'size'}, written)
+
+csvBlockRows = 50000
+# counts below this are formatted by table lookup
+csvNumberLabels = np.array([str(number) for number in range(65536)], dtype=object)
+csvFileExtensions = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+# dtype kinds formatted by formatCsvBlock
+csvBlockKinds = 'biufO'
+
+def writeCsvTable(filePath, table, options):
+    compress = options.get('compress')
+    filePath += csvFileExtensions[compress]
+    if compress == 'zstd' and zstandard is None:
+        raise ImportError('zstandard is not installed, it is needed for --compress zstd')
+
+    sha1 = hashlib.sha1()
+    temporaryFilePath = filePath + '.tmp'
+    blocks = [table.iloc[first:first + csvBlockRows] for first in range(0, len(table), csvBlockRows)]
+    pool = multiprocessing.pool.ThreadPool(options['writerThreads']) if options.get('writerThreads', 1) > 1 else None
+    try:
+        with open(temporaryFilePath, 'wb') as f:
+            header = formatCsvHeader(table)
+            sha1.update(header)
+            f.write(compressCsvBlock(header, compress))
+            # blocks are written in order, map keeps order of results
+            blockMap = pool.imap if pool else map
+            for content, compressedContent in blockMap(lambda block: formatCsvBlock(block, compress), blocks):
+                sha1.update(content)
+                f.write(compressedContent)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    # unchanged file is kept as it is, so that its time stamp shows when its content changed
+    fileName = os.path.basename(filePath)
+    previousHash = options.get('previousHashes', {}).get(fileName)
+    fileHash = {'sha1': sha1.hexdigest(), 'size': os.path.getsize(temporaryFilePath)}
+    if previousHash == fileHash and os.path.exists(filePath) and os.path.getsize(filePath) == fileHash['size']:
+        os.remove(temporaryFilePath)
+        return filePath, fileHash, False
+    os.replace(temporaryFilePath, filePath)
+
+    return filePath, fileHash, True
+
+def formatCsvHeader(table):
+    return (','.join(quoteCsvFields([str(column) for column in table.columns])) + os.linesep).encode('utf-8')
+
+def formatCsvBlock(block, compress):
+    if not all(isinstance(dtype, np.dtype) and dtype.kind in csvBlockKinds for dtype in block.dtypes):
+        content = block.to_csv(header=False, index=False).encode('utf-8')
+        return content, compressCsvBlock(content, compress)
+
+    fields = np.empty(block.shape, dtype=object)
+    # integer columns (counts of each period) are formatted together as a matrix
+    integerColumns = [number for number, dtype in enumerate(block.dtypes) if dtype.kind in 'iu']
+    if integerColumns:
+        fields[:, integerColumns] = formatCsvIntegers(block.iloc[:, integerColumns].values)
+    for number in range(block.shape[1]):
+        if number not in integerColumns:
+            fields[:, number] = formatCsvColumn(block.iloc[:, number])
+    # empty field of a single column is quoted, otherwise the row would be a blank line
+    if block.shape[1] == 1:
+        fields[fields == ''] = '""'
+    content = ''.join(','.join(row) + os.linesep for row in fields.tolist()).encode('utf-8')
+
+    return content, compressCsvBlock(content, compress)
+
+def formatCsvIntegers(values):
+    fields = csvNumberLabels.take(values, mode='clip')
+    large = (values < 0) | (values >= len(csvNumberLabels))
+    if large.any():
+        fields[large] = [str(value) for value in values[large].tolist()]
+
+    return fields
+
+def formatCsvColumn(column):
+    values = column.values
+    if column.dtype.kind == 'f':
+        return np.array(['' if value != value else repr(value) for value in values.tolist()], dtype=object)
+    # strings and other objects are written as str() like to_csv, missing values as empty field
+    return np.array(quoteCsvFields(['' if value is None or value != value else str(value) for value in values.tolist()]), dtype=object)
+
+# quote fields having delimiter, quote or line break (csv.QUOTE_MINIMAL)
+def quoteCsvFields(fields):
+    return ['"' + field.replace('"', '""') + '"' if (',' in field or '"' in field or '\n' in field or '\r' in field) else field
+            for field in fields]
+
+# gzip members and zstd frames can be concatenated, so each block is compressed on its own
+def compressCsvBlock(content, compress):
+    if compress == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(content) + compressor.flush()
+    if compress == 'zstd':
+        return zstandard.ZstdCompressor().compress(content)
+
+    return content
+
+#----------------------------------------------------------------------------------------------------------
+
+# stat store payload, the JSON stored by tools/processors/stat.js as 'stat-{dataset}'
+#   each stat view is a list of rows {column: value} as csv-parse gives, but counts are kept as numbers
+#   rows of each view are written by its worker into {fileName}_{version}_{dataset}.json,
+#   then they are joined into the payload without parsing them again
+
+def writeStatStoreRows(filePath, table):
+    with open(filePath, 'w', encoding='utf-8') as f:
+        json.dump(table.to_dict('records'), f, separators=(',', ':'), ensure_ascii=False, default=getJsonValue)
+
+def getJsonValue(value):
+    # NumPy integers are not serializable, dates are written as str() like to_csv
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+# join rows of stat views into payload, views without rows (failed or not run) keep their rows in the existing payload,
+# or get empty list when there is none
+#   views = [(key, filePath of rows)] of every view of the payload
+def writeStatStore(storeFilePath, views):
+    previousStore = {}
+    if any(not os.path.exists(filePath) for key, filePath in views) and os.path.exists(storeFilePath):
+        with open(storeFilePath, encoding='utf-8') as f:
+            previousStore = json.load(f)
+
+    # payload is replaced at once, so the server never reads a partly written file
+    temporaryFilePath = storeFilePath + '.tmp'
+    with open(temporaryFilePath, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for number, (key, filePath) in enumerate(views):
+            f.write((',' if number else '') + json.dumps(key) + ':')
+            if os.path.exists(filePath):
+                with open(filePath, encoding='utf-8') as rows:
+                    shutil.copyfileobj(rows, f)
+                os.remove(filePath)
+            else:
+                json.dump(previousStore.get(key, []), f, separators=(',', ':'), ensure_ascii=False)
+        f.write('}')
+    os.replace(temporaryFilePath, storeFilePath)
+
+#----------------------------------------------------------------------------------------------------------
 
-    # No.14 Stat view data:   Clade count of in each country by week
-    try: 
-        print("---------- Processing: No.14 Stat view ---------- ")
+# tracing of pre-processing steps and stat views for run report
+#   wallTime, cpuTime = seconds spent in step
+#   inputRows, outputRows = rows of DataFrame/Series given to and returned from step
+#   peakRss = peak resident memory of the process (kB) at the end of step, it never decreases within a process
+
+def traceStep(steps, name, function, *args):
+    startTime = time.time()
+    startCpuTime = time.process_time()
+    result = function(*args)
+    steps.append({
+        'name': name,
+        'wallTime': time.time() - startTime,
+        'cpuTime': time.process_time() - startCpuTime,
+        'inputRows': countRows(args),
+        'outputRows': countRows([result]),
+        'peakRss': getPeakRss(),
+    })
+
+    return result
+
+def countRows(values):
+    rows = [len(value) for value in values if isinstance(value, (pd.DataFrame, pd.Series))]
+
+    return sum(rows) if rows else None
+
+# children = True for the largest of child processes which have finished (worker processes of stat views and shards)
+def getPeakRss(children=False):
+    if resource is None:
+        return None
+    peakRss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS
+    return peakRss // 1024 if sys.platform == 'darwin' else peakRss
+
+def readOutputHashes(filePath):
+    try:
+        with open(filePath) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def writeRunReport(filePath, report):
+    with open(filePath, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
 
-        selectRange = 'Geo_Country'
-        index = 'Detail'
-        period = 'Week'
-        mergedCladeCountByWeek = processTargetCountByPeriod(mergedCladeData, selectRange, index, period)
-        fileName = '07_country_clade_week_'+version+'_'+dataset+'.csv'
-        mergedCladeCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
+#----------------------------------------------------------------------------------------------------------
 
-        print("---------- Done: No.14 Stat view ---------- ")
+# run stat views and write their output files
+#   workers > 1 runs views on forked worker processes, which share inputs with this process instead of copying them
+#   an error in one view does not stop the others, returns trace of each view (see runStatView)
+#   options = {'format': 'wide', 'sparse' or 'both', 'csv': False for no CSV files, 'json': True for stat store payload,
+#              'storeFileNames': file names of views written into stat store payload (see getStatStoreFileNames),
+#              'compress', 'writerThreads', 'previousHashes' (see writeCsvTable), 'profileView': No. of view to profile, 'profiler': 'cProfile' or 'pyinstrument'}
+#     sparse output of time series count table is {fileName}_{version}_{dataset}_sparse.csv with non-zero counts only
+#     ({selectRange}, [{index},] {period}, count), and {fileName}_{version}_{dataset}_periods.csv with all periods of the table
+
+def runStatViews(views, inputs, outputFolder, version, dataset, workers=1, options=None):
+    global statViewContext
+    statViewContext = (views, inputs, outputFolder, version, dataset, options or {})
+
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context('fork').Pool(min(workers, len(views)))
+        try:
+            results = pool.map(runStatView, range(len(views)), chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [runStatView(viewIndex) for viewIndex in range(len(views))]
+
+    return results
+
+statViewContext = None
+
+# run a stat view and get its trace
+#   succeeded = False when the view failed
+#   outputBytes = total size of files written
+#   outputHashes = {file name: {'sha1', 'size', 'written'}} of CSV files, written = False when unchanged file was kept
+#   pid = process which ran the view, peakRss is of this process
+
+def runStatView(viewIndex):
+    views, inputs, outputFolder, version, dataset, options = statViewContext
+    view = views[viewIndex]
+    viewTrace = {'number': view.number, 'fileName': view.fileName, 'succeeded': False, 'pid': os.getpid(),
+                 'inputRows': len(inputs[view.input]) if view.input else None}
+    startTime = time.time()
+    startCpuTime = time.process_time()
+    try:
+        print("---------- Processing: No." + str(view.number) + " Stat view ---------- ")
+
+        filePath = outputFolder + os.path.sep + view.fileName + '_' + version + '_' + dataset
+        if options.get('profileView') == view.number:
+            outputRows, outputFiles, outputHashes = profileStatView(view, inputs, filePath, options)
+        else:
+            outputRows, outputFiles, outputHashes = writeStatView(view, inputs, filePath, options)
+        viewTrace['succeeded'] = True
+        viewTrace['outputRows'] = outputRows
+        viewTrace['outputBytes'] = sum(os.path.getsize(fileName) for fileName in outputFiles)
+        viewTrace['outputHashes'] = outputHashes
+
+        print("---------- Done: No." + str(view.number) + " Stat view ---------- ")
     except Exception as e:
-        print("Process error: No.14 Stat view ")
+        print("Process error: No." + str(view.number) + " Stat view ")
         traceback.print_exc()
 
-    # No.15 Stat view data:   Clade count of in each city by week
-    try: 
-        print("---------- Processing: No.15 Stat view ---------- ")
+    viewTrace['wallTime'] = time.time() - startTime
+    viewTrace['cpuTime'] = time.process_time() - startCpuTime
+    viewTrace['peakRss'] = getPeakRss()
+
+    return viewTrace
+
+# write output files of a stat view, returns rows, paths of written tables and hashes of CSV files
+def writeStatView(view, inputs, filePath, options):
+    csvFormat = options.get('format', 'wide') if options.get('csv', True) else None
+    sparseProcess = sparseProcesses.get(view.process)
+    writeSparse = sparseProcess is not None and csvFormat in ('sparse', 'both')
+    writeWide = csvFormat is not None and (sparseProcess is None or csvFormat in ('wide', 'both'))
+    writeJson = options.get('json', False) and view.fileName in options.get('storeFileNames', ())
+    outputRows = 0
+    outputFiles = []
+    csvTables = []
+    if writeSparse:
+        countTable, periodAxis = sparseProcess(inputs, view)
+        csvTables += [(filePath + '_sparse.csv', countTable), (filePath + '_periods.csv', periodAxis)]
+        outputRows += len(countTable)
+    if writeWide or writeJson:
+        result = view.process(inputs, view)
+        if writeWide:
+            csvTables.append((filePath + '.csv', result))
+        if writeJson:
+            writeStatStoreRows(filePath + '.json', result)
+            outputFiles.append(filePath + '.json')
+        outputRows += len(result)
+
+    outputHashes = {}
+    for csvFilePath, table in csvTables:
+        csvFilePath, fileHash, written = writeCsvTable(csvFilePath, table, options)
+        outputFiles.append(csvFilePath)
+        outputHashes[os.path.basename(csvFilePath)] = dict(fileHash, written=written)
+
+    return outputRows, outputFiles, outputHashes
+
+# write output files of a stat view under profiler, profile is written next to output files
+def profileStatView(view, inputs, filePath, options):
+    if options.get('profiler') == 'pyinstrument':
+        try:
+            import pyinstrument
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            try:
+                return writeStatView(view, inputs, filePath, options)
+            finally:
+                profiler.stop()
+                with open(filePath + '_profile.html', 'w') as f:
+                    f.write(profiler.output_html())
+        except ImportError:
+            print("Warning: pyinstrument is not installed, cProfile is used instead")
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(writeStatView, view, inputs, filePath, options)
+    finally:
+        profiler.dump_stats(filePath + '_profile.prof')
 
-        selectRange = 'Geo_City'
-        index = 'Detail'
-        period = 'Week'
-        mergedCladeCountByWeek = processTargetCountByPeriod(mergedCladeData, selectRange, index, period)
-        fileName = '07_city_clade_week_'+version+'_'+dataset+'.csv'
-        mergedCladeCountByWeek.to_csv(outputFolder + os.path.sep + fileName, index=False)
+#----------------------------------------------------------------------------------------------------------
 
-        print("---------- Done: No.15 Stat view ---------- ")
-    except Exception as e:
-        print("Process error: No.15 Stat view ")
+# process data sets of a version together, each in its own process
+#   data sets run concurrently as long as their estimated memory fits in memoryBudget (MB), largest first
+#   period labels are made once before processes are forked, so all data sets share them
+#   returns data sets which failed
+
+def runDatasets(version, datasets, args, memoryBudget=None):
+    memoryBudget = memoryBudget or getPhysicalMemory()
+    memoryEstimates = {dataset: estimateDatasetMemory(version, dataset) for dataset in datasets}
+    print("Data sets: " + ', '.join(dataset + ' (' + str(memoryEstimates[dataset]) + ' MB)' for dataset in datasets))
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return [dataset for dataset in datasets if not runDatasetProcess(version, dataset, args)]
+
+    buildPeriodLabelCache()
+    context = multiprocessing.get_context('fork')
+    pending = sorted(datasets, key=lambda dataset: memoryEstimates[dataset], reverse=True)
+    running = {}
+    failedDatasets = []
+    while pending or running:
+        for dataset in list(pending):
+            usedMemory = sum(memoryEstimates[runningDataset] for process, runningDataset in running.values())
+            # a data set larger than budget still runs, alone
+            if running and memoryBudget and usedMemory + memoryEstimates[dataset] > memoryBudget:
+                continue
+            print("---------- Data set: " + dataset + " ---------- ")
+            # exit code of process is 1 when processDataset exits with error or raises
+            process = context.Process(target=processDataset, args=(version, dataset, args))
+            process.start()
+            running[process.sentinel] = (process, dataset)
+            pending.remove(dataset)
+
+        for sentinel in multiprocessing.connection.wait(list(running)):
+            process, dataset = running.pop(sentinel)
+            process.join()
+            if process.exitcode != 0:
+                failedDatasets.append(dataset)
+
+    return failedDatasets
+
+# process a data set in this process, for platforms without fork
+def runDatasetProcess(version, dataset, args):
+    print("---------- Data set: " + dataset + " ---------- ")
+    try:
+        processDataset(version, dataset, args)
+    except SystemExit as e:
+        return e.code in (None, 0)
+    except Exception:
         traceback.print_exc()
+        return False
+
+    return True
+
+# estimate peak memory (MB) of a data set from its last run report, or from size of its input files
+#   forked worker processes share memory of this process at fork, only their growth beyond it is added for each of them
+def estimateDatasetMemory(version, dataset):
+    reportFilePath = os.path.join(os.getcwd(), "data", version, "Stat-" + dataset, 'run_report_' + version + '_' + dataset + '.json')
+    try:
+        with open(reportFilePath) as f:
+            report = json.load(f)
+        peakRss = report['peakRss']
+        if peakRss:
+            workerPids = set(view['pid'] for view in report.get('views', [])) - set([report.get('pid')])
+            workers = len(workerPids) if workerPids else report['arguments'].get('workers', 1)
+            forkRss = max([step['peakRss'] or 0 for step in report.get('steps', [])] + [0])
+            workerGrowth = max((report.get('childrenPeakRss') or 0) - forkRss, 0)
+            return (peakRss + workers * workerGrowth) // 1024 + 1
+    except (IOError, ValueError, KeyError):
+        pass
+
+    inputFolder = os.path.join(os.getcwd(), "data", version, dataset)
+    inputSize = sum(os.path.getsize(os.path.join(inputFolder, name + '_' + version + '_' + dataset + '.tsv'))
+                    for name in ['samples', 'variant', 'clade']
+                    if os.path.exists(os.path.join(inputFolder, name + '_' + version + '_' + dataset + '.tsv')))
+    # parsed inputs and their cubes take about the size of input files
+    return inputSize // (1024 * 1024) + 1
+
+def getPhysicalMemory():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+#----------------------------------------------------------------------------------------------------------
+
+# load, aggregate and write stat views of a data set
+
+def processDataset(version, dataset, args):
+    startTime = time.time()
+    steps = []
+
+    inputFolder = os.path.join(os.getcwd(),"data",version,dataset )#".\\data" + os.path.sep + version + os.path.sep + dataset
+    outputFolder = os.path.join(os.getcwd(),"data",version,"Stat-"+dataset )#".\\data" + os.path.sep + version + os.path.sep + dataset
+    cacheFolder = os.path.join(inputFolder, cacheFolderName)
+    
+    sampleFilePath = inputFolder + os.path.sep + "samples_" + version + "_" +dataset + ".tsv"
+    variantFilePath = inputFolder + os.path.sep + "variant_" + version + "_" +dataset + ".tsv"
+    cladeFilePath = inputFolder + os.path.sep + "clade_" + version + "_" +dataset + ".tsv"
+    inputFiles = {'variant': variantFilePath, 'clade': cladeFilePath}
+
+    # Select stat views and inputs they need
+    views = statViews
+    try:
+        if args.views:
+            views = selectStatViews(views, args.views.split(','))
+        elif not args.cooccurrence:
+            # co-occurrence tables hold the whole variant data and take long, they are run only on request
+            views = [view for view in views if view.input != 'variantData']
+        if args.views_from_stat_js:
+            views = [view for view in views if view.fileName in getStatJsFileNames(statJsPath)]
+        # stat store payload holds only the views returned by load() of stat.js
+        storeFileNames = getStatStoreFileNames() if args.json else []
+    except (IOError, ValueError) as e:
+        print("Error: " + str(e))
+        sys.exit(1)
+    # views not selected are kept from the existing payload, the application needs every view of it
+    jsonFolder = args.json_dir or os.path.join(os.getcwd(), "data", "json")
+    storeFilePath = os.path.join(jsonFolder, 'stat-' + dataset + '.json')
+    unselectedFileNames = [fileName for fileName in storeFileNames if fileName not in [view.fileName for view in views]]
+    if unselectedFileNames and not os.path.exists(storeFilePath):
+        print("Error: --json needs " + ', '.join(unselectedFileNames) + " to write " + storeFilePath + ", or its previous payload to keep them from")
+        sys.exit(1)
+    # variant data is never held as a whole in stream mode and partitioned mode
+    partitioned = bool(args.shards or args.shard_step)
+    if args.stream or partitioned:
+        skippedViews = [view for view in views if 'variantData' in processInputs.get(view.process, [])]
+        if skippedViews:
+            print("Skipped in " + ('partitioned' if partitioned else 'stream') + " mode: " + ', '.join('No.' + str(view.number) for view in skippedViews))
+        views = [view for view in views if view not in skippedViews]
+    requiredInputs = getRequiredInputs(views)
+    # saved state must have every cube, so that next version can be processed incrementally from it
+    if args.save_state:
+        requiredInputs.update(['sample'] + list(cubeInputs))
+    print("Stat views: " + ', '.join('No.' + str(view.number) for view in views))
+
+    # Check if files exist or not, input files are read by shards in partitioned mode
+    if (not partitioned and fileCheck(sampleFilePath) == 0):
+        sys.exit(1)
+    for name in cubeInputs:
+        if not partitioned and (name in requiredInputs or name + 'Data' in requiredInputs) and fileCheck(inputFiles[name]) == 0:
+            sys.exit(1)
+
+    # Make output folder
+    os.makedirs(outputFolder, exist_ok=True)
+
+    # Load and pre-process data, sample data is held only by shards in partitioned mode
+    sampleData = None
+    if not partitioned and args.no_cache:
+        sampleData = traceStep(steps, 'load sample', loadTable, sampleFilePath, sampleSchema)
+        sampleData = traceStep(steps, 'dateProcess', dateProcess, sampleData)
+    elif not partitioned:
+        sampleData = traceStep(steps, 'load sample', loadCachedTable, sampleFilePath, sampleSchema, cacheFolder, dateProcess)
+
+    # Aggregate each input once, stat views below are rolled up from these cubes
+    variantData = None
+    if partitioned:
+        # counts of the whole data set are summed up from partial cubes of shards
+        cubeNames = [name for name in ['sample'] + list(cubeInputs) if name in requiredInputs]
+        try:
+            cubes, latestCollectionDate = traceStep(steps, 'merge shards', mergeShardCubes, version, dataset, cubeNames)
+        except ValueError as e:
+            print("Error: " + str(e))
+            sys.exit(1)
+    elif args.incremental_from:
+        previousVersion = args.incremental_from
+        previousInputFolder = os.path.join(os.getcwd(),"data",previousVersion,dataset )
+        previousStateFolder = os.path.join(os.getcwd(),"data",previousVersion,"Stat-"+dataset,stateFolderName )
+        previousInputFiles = {
+            'variant': previousInputFolder + os.path.sep + "variant_" + previousVersion + "_" +dataset + ".tsv",
+            'clade': previousInputFolder + os.path.sep + "clade_" + previousVersion + "_" +dataset + ".tsv",
+        }
+        if (fileCheck(os.path.join(previousStateFolder, 'state.json')) == 0):
+            sys.exit(1)
+
+        cubeNames = [name for name in ['sample'] + list(cubeInputs) if name in requiredInputs]
+        state = traceStep(steps, 'load state', loadRunState, previousStateFolder, cubeNames)
+        # files larger than memory are read in chunks in stream mode, they are not loaded through cache
+        cacheFolders = None if args.no_cache or args.stream else (cacheFolder, os.path.join(previousInputFolder, cacheFolderName))
+        try:
+            cubes = traceStep(steps, 'incremental cubes', buildIncrementalAggregationCubes, state, sampleData, inputFiles, previousInputFiles, args.chunk_size, cacheFolders)
+        except (IOError, OSError) as e:
+            # rows of removed samples can not be subtracted without input files of previous version
+            print("Warning: input files of " + previousVersion + " are needed for removed samples (" + str(e) + "), all samples are aggregated again")
+            cubes = None
+    else:
+        cubes = None
+
+    if cubes is None:
+        cubes = {}
+        sampleLookup = None
+        if 'sample' in requiredInputs:
+            cubes['sample'] = traceStep(steps, 'sample cube', buildAggregationCube, sampleData)
+        for name, (schema, index, attributes) in cubeInputs.items():
+            if name not in requiredInputs:
+                continue
+            if args.stream:
+                chunks = loadTableChunks(inputFiles[name], schema, args.chunk_size)
+                cubes[name] = traceStep(steps, name + ' stream cube', buildStreamingAggregationCube, chunks, sampleData, index, attributes)
+            else:
+                if args.no_cache:
+                    data = traceStep(steps, 'load ' + name, loadTable, inputFiles[name], schema)
+                else:
+                    data = traceStep(steps, 'load ' + name, loadCachedTable, inputFiles[name], schema, cacheFolder)
+
+                if sampleLookup is None:
+                    sampleLookup = traceStep(steps, 'sample lookup', buildSampleLookup, sampleData)
+                cubes[name] = traceStep(steps, name + ' cube', buildIndexedAggregationCube, data, sampleLookup, index, attributes)
+                # variant data is kept for co-occurrence tables
+                if name == 'variant' and 'variantData' in requiredInputs:
+                    variantData = data
+                del data
+
+    # Save state, so that next version can be processed incrementally
+    if args.save_state:
+        traceStep(steps, 'save state', saveRunState, os.path.join(outputFolder, stateFolderName), sampleData, cubes)
+
+    # Build mutation catalog, item lists of mutations are listed from it
+    if 'catalog' in requiredInputs:
+        catalog = traceStep(steps, 'mutation catalog', buildMutationCatalog, cubes['variant'])
+        traceStep(steps, 'save mutation catalog', saveMutationCatalog, os.path.join(outputFolder, catalogFolderName), catalog)
+
+    # Save daily index, so that counts of any date range can be queried
+    if args.daily_index:
+        traceStep(steps, 'daily index', buildDailyIndexes, cubes, views, os.path.join(outputFolder, dailyIndexFolderName))
+
+    # Run stat views
+    if not partitioned:
+        latestCollectionDate = getLatestCollectionDate(sampleData)
+    inputs = dict(cubes, sampleData=sampleData, latestCollectionDate=latestCollectionDate)
+    if 'catalog' in requiredInputs:
+        inputs['catalog'] = catalog
+    if 'variantData' in requiredInputs:
+        if variantData is None and args.no_cache:
+            variantData = traceStep(steps, 'load variant', loadTable, variantFilePath, variantSchema)
+        elif variantData is None:
+            variantData = traceStep(steps, 'load variant', loadCachedTable, variantFilePath, variantSchema, cacheFolder)
+        inputs['variantData'] = variantData
+    cooccurrenceCutoff.update({'minSupport': args.min_support})
+    prevalenceCutoff.update({'topN': args.top_n, 'minPrevalence': args.min_prevalence})
+    hashFilePath = os.path.join(outputFolder, 'output_hashes.json')
+    outputHashes = readOutputHashes(hashFilePath)
+    options = {'format': args.output, 'csv': not args.no_csv, 'json': args.json, 'storeFileNames': storeFileNames, 'compress': args.compress, 'writerThreads': args.writer_threads,
+               'previousHashes': outputHashes, 'profileView': args.profile_view, 'profiler': args.profiler}
+    viewTraces = runStatViews(views, inputs, outputFolder, version, dataset, args.workers, options)
+
+    # Save hashes of CSV files, files unchanged in next run are not rewritten
+    for viewTrace in viewTraces:
+        for fileName, fileHash in viewTrace.get('outputHashes', {}).items():
+            outputHashes[fileName] = {'sha1': fileHash['sha1'], 'size': fileHash['size']}
+    with open(hashFilePath, 'w') as f:
+        json.dump(outputHashes, f, indent=1, sort_keys=True)
+
+    # Write stat store payload of the application, with the same key as tools/processors/stat.js
+    if args.json:
+        os.makedirs(jsonFolder, exist_ok=True)
+        storeViews = [(statStoreKeys[fileName], outputFolder + os.path.sep + fileName + '_' + version + '_' + dataset + '.json')
+                      for fileName in storeFileNames]
+        writeStatStore(storeFilePath, storeViews)
+
+    # Write run report
+    writeRunReport(os.path.join(outputFolder, 'run_report_' + version + '_' + dataset + '.json'), {
+        'version': version,
+        'dataset': dataset,
+        'date': datetime.datetime.now().isoformat(),
+        'arguments': vars(args),
+        'totalWallTime': time.time() - startTime,
+        'pid': os.getpid(),
+        'peakRss': getPeakRss(),
+        'childrenPeakRss': getPeakRss(children=True),
+        'steps': steps,
+        'views': viewTraces,
+    })
+#----------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+   #
 
+    parser = argparse.ArgumentParser(description='Create tables for displaying COVID-19 stat views')
+    parser.add_argument('version', help='data version (ex. r18)')
+    parser.add_argument('dataset', help='data set, or comma separated data sets processed together (ex. Full or Full,NCBI)')
+    parser.add_argument('--stream', action='store_true', help='read variant and clade files in chunks')
+    parser.add_argument('--chunk-size', type=int, default=1000000, help='number of rows per chunk in stream mode')
+    parser.add_argument('--save-state', action='store_true', help='save aggregated counts for incremental runs')
+    parser.add_argument('--incremental-from', metavar='VERSION', help='update saved state of previous version')
+    parser.add_argument('--shards', type=int, metavar='N', help='split input files into N shards aggregated separately')
+    parser.add_argument('--partition-by', choices=sorted(partitionColumns), default='country', help='key of shards')
+    parser.add_argument('--shard-step', choices=['split', 'process', 'merge'], help='run only one step of partitioned mode')
+    parser.add_argument('--shard-ids', help='comma separated shards aggregated by --shard-step process (default: all)')
+    parser.add_argument('--memory-budget', type=int, metavar='MB', help='memory shared by data sets processed together (default: physical memory)')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes for stat views')
+    parser.add_argument('--no-cache', action='store_true', help='do not use cache of parsed input files')
+    parser.add_argument('--output', choices=['wide', 'sparse', 'both'], default='wide', help='format of time series count tables')
+    parser.add_argument('--views', help='comma separated No., file name prefixes or globs of stat views to run')
+    parser.add_argument('--views-from-stat-js', action='store_true', help='run stat views loaded by tools/processors/stat.js')
+    parser.add_argument('--json', action='store_true', help='write stat store payload into data/json')
+    parser.add_argument('--json-dir', help='folder of stat store payload (default: data/json)')
+    parser.add_argument('--no-csv', action='store_true', help='do not write CSV files')
+    parser.add_argument('--top-n', type=int, default=prevalenceCutoff['topN'], help='most frequent mutations of each region in prevalence tables')
+    parser.add_argument('--min-prevalence', type=float, default=prevalenceCutoff['minPrevalence'], help='minimum prevalence of mutations in prevalence tables')
+    parser.add_argument('--cooccurrence', action='store_true', help='also run co-occurrence tables (No.28-29)')
+    parser.add_argument('--min-support', type=int, default=cooccurrenceCutoff['minSupport'], help='minimum samples of mutation pairs in co-occurrence tables')
+    parser.add_argument('--daily-index', action='store_true', help='save cumulative daily counts of time series')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], help='compress CSV files')
+    parser.add_argument('--writer-threads', type=int, default=1, help='threads writing each CSV file')
+    parser.add_argument('--profile-view', type=int, metavar='N', help='profile No.N stat view')
+    parser.add_argument('--profiler', choices=['cProfile', 'pyinstrument'], default='cProfile', help='profiler of --profile-view')
+    args = parser.parse_args()
+    if args.no_csv and not args.json:
+        parser.error('--no-csv needs --json, nothing would be written')
+    if args.compress == 'zstd' and zstandard is None:
+        parser.error('--compress zstd needs zstandard, install it with pip install zstandard')
+
+    if (args.shards or args.shard_step) and (args.save_state or args.incremental_from):
+        parser.error('--save-state and --incremental-from cannot be used in partitioned mode')
+    if args.shard_step == 'split' and not args.shards:
+        parser.error('--shard-step split needs --shards N')
+
+    datasets = args.dataset.split(',')
+    # Split input files into shards and aggregate each of them, stat views are made from their partial cubes
+    if args.shards or args.shard_step:
+        for dataset in datasets:
+            if args.shard_step != 'merge' and not runShardSteps(args.version, dataset, args):
+                sys.exit(1)
+        if args.shard_step in ('split', 'process'):
+            sys.exit(0)
+
+    if len(datasets) == 1:
+        processDataset(args.version, datasets[0], args)
+    else:
+        failedDatasets = runDatasets(args.version, datasets, args, args.memory_budget)
+        if failedDatasets:
+            print("Error: failed data sets " + ', '.join(failedDatasets))
+            sys.exit(1)
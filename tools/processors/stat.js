@@ -66,9 +66,32 @@ const load = async () => {
   };
 };
 
+// latest modification time (ms) of stat CSV files of this version, 0 when there is none
+const getStatCsvTime = () => {
+  const statDir = `${dataDir}/${version}/Stat-${dataSet}`;
+  if (!fs.existsSync(statDir)) {
+    return 0;
+  }
+  return fs.readdirSync(statDir)
+    .filter((fileName) => fileName.endsWith(`_${versionSet}.csv`))
+    .reduce((time, fileName) => Math.max(time, fs.statSync(`${statDir}/${fileName}`).mtimeMs), 0);
+};
+
 module.exports = async () => {
   const store = require('../../server/data-store');
-  const data = await load();
   const postfix = dataSet ? `-${dataSet}` : '';
+  const csvTime = getStatCsvTime();
+  if (!csvTime) {
+    // stat data was written into data store by Stat_View_Table_Process.py --json --no-csv
+    console.log('stat CSV files not found, keeping stat' + postfix);
+    return;
+  }
+  // payload written by Stat_View_Table_Process.py --json after the CSV files is newer than them
+  const payloadFile = `${process.env.DATA_STORE_FILE_DIR}/stat${postfix}.json`;
+  if (process.env.DATA_STORE_FILE_DIR && fs.existsSync(payloadFile) && fs.statSync(payloadFile).mtimeMs >= csvTime) {
+    console.log('stat CSV files are older than ' + payloadFile + ', keeping stat' + postfix);
+    return;
+  }
+  const data = await load();
   await store.set('stat' + postfix, data);
 };